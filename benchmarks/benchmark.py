@@ -0,0 +1,207 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT benchmarks
+
+    Times the import of the package, the stress and tangent evaluation of
+    every material model over a range of problem sizes (with the peak memory
+    traced by tracemalloc) and the calibration of synthetic Uniaxial,
+    EquiBiaxial and PureShear data.
+    The results are written as JSON, two result files can be compared.
+
+    python benchmarks/benchmark.py --max-size 1e5 --output results.json
+    python benchmarks/benchmark.py --compare before.json results.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import tensortrax as tr
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import hypermat as hm
+
+
+MODELS = {
+    'NeoHooke': {'C10':0.5},
+    'MooneyRivlin': {'C10':0.4, 'C01':0.1},
+    'Isihara': {'C10':0.4, 'C20':0.01, 'C01':0.1},
+    'Biderman': {'C10':0.4, 'C20':-0.01, 'C30':0.005, 'C01':0.1},
+    'Yeoh': {'C10':0.5, 'C20':-0.01, 'C30':0.005},
+    'JamesGreenSimpson': {'C10':0.4, 'C20':-0.01, 'C30':0.005, 'C01':0.1, 'C11':0.01},
+    'Ogden': {'mu1':1.0, 'a1':2.0},
+}
+BULK = 100.0
+TESTS = ('Uniaxial', 'EquiBiaxial', 'PureShear')
+# number of points evaluated at once for the large problems
+CHUNK = 200000
+
+
+def _deformation(size, ngp=8, seed=0):
+    """Random deformation gradients with stretches up to about 1.2"""
+    ngp = min(ngp, size)
+    rng = np.random.default_rng(seed)
+    return (np.eye(3) + rng.uniform(-0.1, 0.1, (size // ngp, ngp, 3, 3))).T
+
+def _measure(func, repeat):
+    """Best wall time of `repeat` calls and the peak traced memory"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+def bench_evaluation(sizes, repeat, models=MODELS):
+    """Stress and tangent timings of every model and problem size"""
+    results = []
+    for name, params in models.items():
+        for size in sizes:
+            F = _deformation(size)
+            umat = getattr(hm, name)(**params, K=BULK)
+            ngp = F.shape[2]
+            kwds = {'chunk_size':max(1, CHUNK // ngp)} if size > CHUNK else {}
+            for quantity, func in (('stress', lambda: umat.jacobian(F, **kwds)),
+                                   ('tangent', lambda: umat.hessian(F, **kwds))):
+                if quantity == 'tangent' and size > 10 * CHUNK and repeat > 1:
+                    _repeat = 1
+                else:
+                    _repeat = repeat
+                elapsed, peak = _measure(func, _repeat)
+                results.append({'benchmark':'evaluation', 'model':name,
+                                'quantity':quantity, 'size':F[0,0].size,
+                                'time':elapsed, 'peak_memory':peak,
+                                'throughput':F[0,0].size / elapsed})
+                print('%-18s %-8s %9d  %9.4f s  %9.1f MB'%(name, quantity,
+                      F[0,0].size, elapsed, peak / 1e6))
+    return results
+
+def bench_calibration(points, models=MODELS):
+    """End-to-end fits on synthetic data of the three loading types"""
+    # warm the import of the fitting dependencies, which are imported on
+    # first use, so it is not timed in the first fit
+    import lmfit  # noqa: F401
+    results = []
+    strain = np.linspace(0.01, 1.5, points)
+    for name, params in models.items():
+        for test in TESTS:
+            # synthetic data of the model, fitted from perturbed parameters
+            reference = getattr(hm, test)(getattr(hm, name)(**params, K=BULK),
+                                          {'strain':strain, 'stress':np.zeros(points)})
+            lam2 = reference._solve(reference._guess(reference._stretch()))
+            reference._set_lateral(reference._grad, lam2)
+            data = {'strain':strain, 'stress':reference.stress()[0,0,:,0].copy()}
+            start = {key:1.5 * value for key, value in params.items()}
+            umat = getattr(hm, name)(**start, K=BULK)
+            n = len(params)
+            fit = getattr(hm, test)(umat, data)
+            elapsed = time.perf_counter()
+            result = fit.fit_data([-10.0] * n + [0.0], [10.0] * n + [1e4],
+                                  [True] * n + [False])
+            elapsed = time.perf_counter() - elapsed
+            results.append({'benchmark':'calibration', 'model':name, 'test':test,
+                            'size':points, 'time':elapsed, 'nfev':result.nfev,
+                            'chisqr':result.chisqr, 'solves':fit.stats['solves']})
+            print('%-18s %-12s %6d  %9.4f s  %4d nfev'%(name, test, points,
+                                                        elapsed, result.nfev))
+    return results
+
+def bench_import(repeat):
+    """Wall time of `import hypermat` in a fresh interpreter and the heavy
+    dependencies it loads"""
+    code = ("import sys, time; start = time.perf_counter(); import hypermat; "
+            "elapsed = time.perf_counter() - start; print(elapsed); "
+            "print(' '.join(name for name in ('lmfit', 'scipy', 'matplotlib') "
+            "if name in sys.modules))")
+    cwd = Path(__file__).resolve().parents[1]
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                                text=True, check=True, cwd=cwd).stdout.split('\n')
+        times.append(float(output[0]))
+    print('%-18s %-8s %9s  %9.4f s  %s'%('import hypermat', '', '', min(times),
+                                         output[1] or 'no heavy dependencies'))
+    return [{'benchmark':'import', 'model':'hypermat', 'size':0, 'time':min(times),
+             'modules':output[1].split()}]
+
+def _metadata():
+    """Versions and platform of the run"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True,
+                                cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'date':datetime.now(timezone.utc).isoformat(), 'commit':commit,
+            'python':platform.python_version(), 'numpy':np.__version__,
+            'tensortrax':getattr(tr, '__version__', None),
+            'platform':platform.platform(), 'processor':platform.processor()}
+
+def _key(result):
+    """Identity of a benchmark entry across runs"""
+    return tuple(result.get(key) for key in ('benchmark', 'model', 'quantity',
+                                             'test', 'size'))
+
+def compare(before, after):
+    """Print the time ratios of the common entries of two result files"""
+    with open(before) as file:
+        old = {_key(result):result for result in json.load(file)['results']}
+    with open(after) as file:
+        new = {_key(result):result for result in json.load(file)['results']}
+    print('%-12s %-18s %-12s %9s  %10s %10s %7s'%('benchmark', 'model', 'case',
+                                                   'size', 'before', 'after', 'ratio'))
+    for key in sorted(set(old) & set(new), key=str):
+        case = key[2] or key[3] or ''
+        ratio = new[key]['time'] / old[key]['time']
+        print('%-12s %-18s %-12s %9d  %10.4f %10.4f %7.2f'%(key[0], key[1], case, key[4],
+              old[key]['time'], new[key]['time'], ratio))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-size', type=float, default=1e2,
+                        help='smallest number of points ngp x nel')
+    parser.add_argument('--max-size', type=float, default=1e5,
+                        help='largest number of points ngp x nel, up to 1e7')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='repetitions, the best time is reported')
+    parser.add_argument('--points', type=int, default=200,
+                        help='number of data points of the calibration')
+    parser.add_argument('--models', nargs='+', default=list(MODELS),
+                        help='subset of the material models')
+    parser.add_argument('--skip-calibration', action='store_true')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two result files and exit')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    models = {name:MODELS[name] for name in args.models}
+    sizes = [int(10**k) for k in range(int(np.log10(args.min_size)),
+                                        int(np.log10(args.max_size)) + 1)]
+    warnings.simplefilter('ignore', RuntimeWarning)
+    results = bench_import(args.repeat)
+    results += bench_evaluation(sizes, args.repeat, models)
+    if not args.skip_calibration:
+        results += bench_calibration(args.points, models)
+    with open(args.output, 'w') as file:
+        json.dump({'metadata':_metadata(), 'results':results}, file, indent=1)
+    print('Results written to %s'%(args.output))
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,20 @@
 from ._models import *
 from ._ad import Deformation
-from ._calibration import *
+from ._fem import ElementIntegrals, integrate
+from ._profiling import Profiler, profile
+
+# The calibration module is imported on first access of one of its names,
+# fitting (lmfit, scipy) and plotting (matplotlib) are imported on first use.
+_CALIBRATION = ('Test', 'Uniaxial', 'EquiBiaxial', 'PureShear', 'ObjectiveCache',
+                'Joint', 'sweep', 'read_file', 'to_dict', 'decimate')
+
+__all__ = [_name for _name in globals() if not _name.startswith('_')] + list(_CALIBRATION)
+
+def __getattr__(name):
+    if name in _CALIBRATION:
+        from . import _calibration
+        return getattr(_calibration, name)
+    raise AttributeError("module %r has no attribute %r"%(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_CALIBRATION))
@@ -3,3 +3,5 @@
 
 """Automatic differentiation Module"""
 from ._deformation import Deformation
+from ._invariants import Invariants
+from ._stretches import Stretches
@@ -20,38 +20,55 @@
     along with this program; if not, write to the Free Software
     Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
+from functools import cached_property
 from typing import Union, Iterable
 
+import numpy as np
 import tensortrax as tr
 import tensortrax.math as tm
 
 class Deformation():
     """Deformation Gradient class"""
-    def __init__(self, f: Union[Iterable, int, float], **kwargs):
+    def __init__(self, f: Union[Iterable, int, float], hessian: bool = True,
+                 dtype=None, **kwargs):
         """Initialise deformation gradient values
 
         Args:
             f (Union[Iterable, int, float]): Initial values of deformation gradient.
+            hessian (bool): Track second order derivatives (hyper-dual numbers).
+                If False, only the gradient is tracked (dual numbers) and the
+                derivatives are read with `tr.δ`. Defaults to True.
+            dtype (np.dtype): Floating point precision. Defaults to float64.
         """
-        self._f = tr.Tensor(f, ntrax=2, **kwargs)
-        self._f.init(gradient=True, hessian=True, δx=True, Δx=True)
+        self.hessian = hessian
+        _f = np.asarray(f, dtype=dtype or float)
+        kwargs.setdefault('ntrax', _f.ndim - 2)
+        self._f = tr.Tensor(_f, **kwargs)
+        self._f.init(gradient=True, hessian=hessian, δx=True, Δx=True)
 
-    @property
+    @cached_property
+    def right_cauchy_green(self):
+        """Calculate the right Cauchy-Green deformation tensor C = FᵀF."""
+        _f = self._f
+        return _f.T @ _f
+    @cached_property
+    def _i3(self):
+        """Calculate the third invariant I3 = det(C)."""
+        return tm.linalg.det(self.right_cauchy_green)
+    @cached_property
     def invariants(self):
         """Calculate Cauchy Green Strain invariants."""
-        _f = self._f
-        _c = _f.T @ _f
+        _c = self.right_cauchy_green
         _i1 = tm.trace(_c)
         _i2 = 0.5 * (_i1**2.0 - tm.trace(_c@_c))
-        _i3 = tm.linalg.det(_c)
+        _i3 = self._i3
         _j1 = _i3**(-1.0/3.0) * _i1
         _j2 = _i3**(-2.0/3.0) * _i2
         _j3 = _i3**(1.0/2.0)
         return (_c, _j1, _j2, _j3)
-    @property
+    @cached_property
     def stretches(self):
         """Calculate principal stretches."""
-        _f = self._f
-        _c = _f.T @ _f
-        _lmbda_i = tm.linalg.det(_c)**(-1.0/6.0) * tm.linalg.eigvalsh(_c)**0.5
+        _c = self.right_cauchy_green
+        _lmbda_i = self._i3**(-1.0/6.0) * tm.linalg.eigvalsh(_c)**0.5
         return _lmbda_i
@@ -0,0 +1,143 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+from typing import Union, Iterable
+
+import numpy as np
+import tensortrax as tr
+
+
+def _dual(_a, _shape, _ndim, dtype=None):
+    """Dense dual data with the leading dual axes of size one removed."""
+    if not isinstance(_a, np.ndarray):
+        return np.zeros(_shape + (1,)*_ndim, dtype=dtype)
+    return _a.reshape(_shape + _a.shape[_a.ndim-_ndim:])
+
+
+class Invariants():
+    """Scalar hyper-dual modified invariants of a deformation gradient.
+
+    A drop-in replacement for `Deformation` in strain energy functions of
+    the form W(J1, J2, J3). The invariants are the independent variables of
+    the algorithmic differentiation, so only the scalar function is
+    differentiated. The derivatives are then mapped on the deformation
+    gradient by the closed-form derivatives of J1, J2 and J3 w.r.t. F.
+    """
+    def __init__(self, f: Union[Iterable, int, float], hessian: bool = True,
+                 dtype=None):
+        """Initialise deformation gradient values
+
+        Args:
+            f (Union[Iterable, int, float]): Values of deformation gradient.
+            hessian (bool): Track second order derivatives. Defaults to True.
+            dtype (np.dtype): Floating point precision. Defaults to float64.
+        """
+        self.hessian = hessian
+        self.f = np.asarray(f, dtype=dtype or float)
+        self.dtype = self.f.dtype
+        _f = self.f
+        self.c = np.einsum('ki...,kj...->ij...', _f, _f)
+        self.b = np.einsum('ik...,jk...->ij...', _f, _f)
+        self.i1 = np.einsum('ii...->...', self.c)
+        self.i2 = 0.5 * (self.i1**2.0 - np.einsum('ij...,ji...->...', self.c, self.c))
+        _cof = np.stack([np.cross(_f[:, 1], _f[:, 2], axis=0),
+                         np.cross(_f[:, 2], _f[:, 0], axis=0),
+                         np.cross(_f[:, 0], _f[:, 1], axis=0)], axis=1)
+        _det = np.einsum('i...,i...->...', _f[:, 0], _cof[:, 0])
+        self.j3 = np.abs(_det)
+        self.h = _cof / _det
+        _j = np.stack([self.j3**(-2.0/3.0) * self.i1,
+                       self.j3**(-4.0/3.0) * self.i2,
+                       self.j3])
+        self._j = tr.Tensor(_j, ntrax=_j.ndim-1)
+        self._j.init(gradient=True, hessian=hessian)
+
+    @property
+    def invariants(self):
+        """Modified invariants as independent hyper-dual variables.
+
+        The right Cauchy-Green tensor is not tracked and returned as None.
+        """
+        _j = self._j
+        return (None, _j[0], _j[1], _j[2])
+
+    def gradients(self):
+        """Closed-form derivatives dJa/dF of the modified invariants."""
+        _f, _h = self.f, self.h
+        _di1 = 2.0 * _f
+        _di2 = 2.0 * (self.i1 * _f - np.einsum('ik...,kj...->ij...', _f, self.c))
+        _dj1 = self.j3**(-2.0/3.0) * (_di1 - 2.0/3.0 * self.i1 * _h)
+        _dj2 = self.j3**(-4.0/3.0) * (_di2 - 4.0/3.0 * self.i2 * _h)
+        _dj3 = self.j3 * _h
+        return _di1, _di2, np.stack([_dj1, _dj2, _dj3])
+
+    def evaluate(self, _w):
+        """Map the derivatives of a scalar function W(J1, J2, J3) on F.
+
+        Args:
+            _w (tr.Tensor): Strain energy built from `invariants`.
+
+        Returns:
+            tuple: Energy W, stress P = dW/dF and tangent A = d²W/dF² (None if
+            the hessian is not tracked).
+        """
+        _shape = self.j3.shape
+        _ndim = len(_shape)
+        _energy = np.array(np.broadcast_to(_dual(np.asarray(tr.f(_w), dtype=self.dtype),
+                                                 (), _ndim), _shape))
+        _dw = _dual(tr.δ(_w), (3,), _ndim, self.dtype)
+        _di1, _di2, _dj = self.gradients()
+        _dwdf = np.einsum('a...,aij...->ij...', _dw, _dj)
+        if not self.hessian:
+            return _energy, _dwdf, None
+
+        _f, _h = self.f, self.h
+        _i1, _i2 = self.i1, self.i2
+        _p1, _p2 = -2.0/3.0, -4.0/3.0
+        _c1 = _dw[0] * self.j3**_p1
+        _c2 = _dw[1] * self.j3**_p2
+        _c3 = _dw[2] * self.j3
+        _ddw = _dual(tr.Δδ(_w), (3, 3), _ndim, self.dtype)
+        # dyadic products of the basis (dJ1, dJ2, dJ3, H, F)
+        _g = np.concatenate([_dj, _h[None], _f[None]])
+        _m = np.zeros((5, 5) + np.broadcast_shapes(_ddw.shape[2:], _shape),
+                      dtype=self.dtype)
+        _m[:3, :3] = _ddw
+        _m[1, 3] = _m[3, 1] = _p2 * _dw[1]
+        _m[3, 4] = _m[4, 3] = 2.0 * _p1 * _c1
+        _m[3, 3] = _p1**2.0 * _c1 * _i1 - _p2**2.0 * _c2 * _i2 + _c3
+        _m[4, 4] = 4.0 * _c2
+        _ddwdfdf = np.einsum('aij...,akl...->ijkl...', _g,
+                             np.einsum('ab...,bkl...->akl...', _m, _g))
+        # non-symmetric products H_il H_kj and F_il F_kj
+        _ddwdfdf -= np.einsum('ail...,akj...->ijkl...', _g[3:],
+                              np.stack([(_p1 * _c1 * _i1 + _p2 * _c2 * _i2 + _c3) * _h,
+                                        2.0 * _c2 * _f]))
+        # products with the identity δ_ik δ_jl, δ_ik C_lj and b_ik δ_jl
+        _c1 = 2.0 * _c1 + 2.0 * _c2 * _i1
+        _c2 = 2.0 * _c2
+        for _i in range(3):
+            _ddwdfdf[_i, :, _i, :] -= _c2 * self.c
+            _ddwdfdf[:, _i, :, _i] -= _c2 * self.b
+            for _j in range(3):
+                _ddwdfdf[_i, _j, _i, _j] += _c1
+        return _energy, _dwdf, _ddwdfdf
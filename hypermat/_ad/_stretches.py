@@ -0,0 +1,196 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+from typing import Union, Iterable
+
+import numpy as np
+import tensortrax as tr
+
+from ._invariants import _dual
+
+
+def _unit(_v):
+    """Normalize a batch of vectors, zero vectors are kept"""
+    _norm = np.sqrt(np.einsum('i...,i...->...', _v, _v))
+    return _v / np.where(_norm > 0.0, _norm, 1.0)
+
+def eigh(_c):
+    """Closed-form eigenvalues and eigenvectors of a batch of symmetric 3x3
+    matrices with shape (3, 3, ...).
+
+    The eigenvalue which is farthest from the mean is obtained by the
+    trigonometric solution of the characteristic polynomial and its
+    eigenvector by the largest cross product of two rows of C - c I. The
+    other two eigenpairs follow from the symmetric 2x2 problem on the
+    orthogonal complement, which stays well-conditioned for coincident
+    eigenvalues. The eigenvectors always form an orthonormal basis.
+
+    Returns:
+        tuple: Eigenvalues with shape (3, ...) and eigenvectors with shape
+        (3, 3, ...) where _n[a] is the eigenvector of the eigenvalue a.
+    """
+    _dtype = _c.dtype
+    _q = np.einsum('ii...->...', _c) / 3.0
+    _p1 = _c[0,1]**2 + _c[0,2]**2 + _c[1,2]**2
+    _p2 = (_c[0,0] - _q)**2 + (_c[1,1] - _q)**2 + (_c[2,2] - _q)**2 + 2.0 * _p1
+    _p = np.sqrt(_p2 / 6.0)
+    _b = _c - _q * np.eye(3, dtype=_dtype).reshape((3, 3) + (1,)*(_c.ndim-2))
+    _b = _b / np.where(_p > 0.0, _p, 1.0)
+    _r = np.clip(0.5 * np.einsum('i...,i...->...', _b[0],
+                                 np.cross(_b[1], _b[2], axis=0)), -1.0, 1.0)
+    _phi = np.arccos(_r) / 3.0
+    # largest (r > 0) or smallest (r < 0) eigenvalue, the farthest from q
+    _c1 = np.where(_r >= 0.0, _q + 2.0 * _p * np.cos(_phi),
+                   _q + 2.0 * _p * np.cos(_phi + 2.0 * np.pi / 3.0))
+    _a = _c - _c1 * np.eye(3, dtype=_dtype).reshape((3, 3) + (1,)*(_c.ndim-2))
+    _x = np.stack([np.cross(_a[0], _a[1], axis=0), np.cross(_a[1], _a[2], axis=0),
+                   np.cross(_a[0], _a[2], axis=0)])
+    _k = np.argmax(np.einsum('ki...,ki...->k...', _x, _x), axis=0)
+    _n1 = np.take_along_axis(_x, _k[None, None], axis=0)[0]
+    _n1 = _unit(_n1)
+    # isotropic C: any basis
+    _zero = np.einsum('i...,i...->...', _n1, _n1) == 0.0
+    _n1[0] = np.where(_zero, 1.0, _n1[0])
+    # orthonormal basis (u, v) of the complement of n1
+    _e = (np.abs(_n1[0]) >= 0.9).astype(_dtype)
+    _t = np.stack([1.0 - _e, _e, np.zeros_like(_e)])
+    _u = _unit(np.cross(_n1, _t, axis=0))
+    _v = np.cross(_n1, _u, axis=0)
+    _cu = np.einsum('ij...,j...->i...', _c, _u)
+    _cv = np.einsum('ij...,j...->i...', _c, _v)
+    _m11 = np.einsum('i...,i...->...', _u, _cu)
+    _m22 = np.einsum('i...,i...->...', _v, _cv)
+    _m12 = np.einsum('i...,i...->...', _u, _cv)
+    _theta = 0.5 * np.arctan2(2.0 * _m12, _m11 - _m22)
+    _cos, _sin = np.cos(_theta), np.sin(_theta)
+    _n2 = _cos * _u + _sin * _v
+    _n3 = _cos * _v - _sin * _u
+    _n = np.stack([_n1, _n2, _n3])
+    # Rayleigh quotients, consistent with the basis
+    _values = np.einsum('ai...,ij...,aj...->a...', _n, _c, _n)
+    return _values, _n
+
+
+class Stretches():
+    """Scalar hyper-dual principal stretches of a deformation gradient.
+
+    A drop-in replacement for `Deformation` in strain energy functions of
+    the (isochoric) principal stretches and the volume ratio. The
+    eigenvalues c_a of the right Cauchy-Green tensor are the independent
+    variables of the algorithmic differentiation, the derivatives w.r.t. F
+    follow from the closed-form spectral derivatives
+
+        S = 2 Σ w_a N_a ⊗ N_a
+        ℂ = 4 Σ w_ab N_a ⊗ N_a ⊗ N_b ⊗ N_b + 4 Σ_a<b θ_ab G_ab
+
+    with w_a = dW/dc_a and θ_ab = (w_a - w_b) / (c_a - c_b), which is
+    replaced by its limit (w_aa + w_bb)/2 - w_ab for coincident eigenvalues.
+    """
+    def __init__(self, f: Union[Iterable, int, float], hessian: bool = True,
+                 dtype=None):
+        """Initialise deformation gradient values
+
+        Args:
+            f (Union[Iterable, int, float]): Values of deformation gradient.
+            hessian (bool): Track second order derivatives. Defaults to True.
+            dtype (np.dtype): Floating point precision. Defaults to float64.
+        """
+        self.hessian = hessian
+        self.f = np.asarray(f, dtype=dtype or float)
+        self.dtype = self.f.dtype
+        self.c = np.einsum('ki...,kj...->ij...', self.f, self.f)
+        self.eigenvalues, self.eigenvectors = eigh(self.c)
+        _c = self.eigenvalues
+        self._c = tr.Tensor(_c, ntrax=_c.ndim-1)
+        self._c.init(gradient=True, hessian=hessian)
+
+    @property
+    def _i3(self):
+        """Third invariant I3 = det(C) = c1 c2 c3"""
+        _c = self._c
+        return _c[0] * _c[1] * _c[2]
+    @property
+    def stretches(self):
+        """Isochoric principal stretches as functions of the eigenvalues"""
+        _c = self._c
+        _scale = self._i3**(-1.0/6.0)
+        return (_scale * _c[0]**0.5, _scale * _c[1]**0.5, _scale * _c[2]**0.5)
+    @property
+    def invariants(self):
+        """Modified invariants as functions of the eigenvalues.
+
+        The right Cauchy-Green tensor is not tracked and returned as None.
+        """
+        _c = self._c
+        _i3 = self._i3
+        _j1 = _i3**(-1.0/3.0) * (_c[0] + _c[1] + _c[2])
+        _j2 = _i3**(-2.0/3.0) * (_c[0] * _c[1] + _c[1] * _c[2] + _c[0] * _c[2])
+        return (None, _j1, _j2, _i3**0.5)
+
+    def evaluate(self, _w):
+        """Map the derivatives of a scalar function W(c1, c2, c3) on F.
+
+        Args:
+            _w (tr.Tensor): Strain energy built from `stretches` or
+                `invariants`.
+
+        Returns:
+            tuple: Energy W, stress P = dW/dF and tangent A = d²W/dF² (None if
+            the hessian is not tracked).
+        """
+        _shape = self.f.shape[2:]
+        _ndim = len(_shape)
+        _energy = np.array(np.broadcast_to(_dual(np.asarray(tr.f(_w), dtype=self.dtype),
+                                                 (), _ndim), _shape))
+        _dw = _dual(tr.δ(_w), (3,), _ndim, self.dtype)
+        _n = self.eigenvectors
+        # two-point tensors E_a = F N_a ⊗ N_a
+        _fn = np.einsum('iJ...,aJ...->ai...', self.f, _n)
+        _e = np.einsum('ai...,aJ...->aiJ...', _fn, _n)
+        _dwdf = 2.0 * np.einsum('a...,aiJ...->iJ...', _dw, _e)
+        if not self.hessian:
+            return _energy, _dwdf, None
+
+        _ddw = _dual(tr.Δδ(_w), (3, 3), _ndim, self.dtype)
+        _c = self.eigenvalues
+        _tol = np.finfo(self.dtype).eps**(1.0/3.0) * np.max(np.abs(_c), axis=0)
+        # basis (E_1, E_2, E_3, H_12, H_23, H_13) with H_ab = F N_a ⊗ N_b + F N_b ⊗ N_a
+        _pairs = ((0, 1), (1, 2), (0, 2))
+        _g = np.concatenate([_e, np.stack([
+            np.einsum('i...,J...->iJ...', _fn[a], _n[b]) +
+            np.einsum('i...,J...->iJ...', _fn[b], _n[a]) for a, b in _pairs])])
+        _m = np.zeros((6, 6) + np.broadcast_shapes(_ddw.shape[2:], _shape),
+                      dtype=self.dtype)
+        _m[:3, :3] = 4.0 * _ddw
+        for _k, (a, b) in enumerate(_pairs):
+            _dc = _c[a] - _c[b]
+            _close = np.abs(_dc) <= _tol
+            _theta = np.where(_close, 0.5 * (_ddw[a, a] + _ddw[b, b]) - _ddw[a, b],
+                              (_dw[a] - _dw[b]) / np.where(_close, 1.0, _dc))
+            _m[3+_k, 3+_k] = 2.0 * _theta
+        _ddwdfdf = np.einsum('aij...,akl...->ijkl...', _g,
+                             np.einsum('ab...,bkl...->akl...', _m, _g))
+        # geometric term δ_ik S_JL
+        _s = 2.0 * np.einsum('a...,aJ...,aL...->JL...', _dw, _n, _n)
+        for _i in range(3):
+            _ddwdfdf[_i, :, _i, :] += _s
+        return _energy, _dwdf, _ddwdfdf
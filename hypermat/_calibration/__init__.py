@@ -4,4 +4,7 @@
 """Calibration Module"""
 
 from ._load import Test, Uniaxial, EquiBiaxial, PureShear
-from ._utils import read_file, to_dict
+from ._cache import ObjectiveCache
+from ._joint import Joint
+from ._sweep import sweep
+from ._utils import read_file, to_dict, decimate
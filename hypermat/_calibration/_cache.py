@@ -0,0 +1,73 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ObjectiveCache():
+    """Bounded least-recently-used cache of objective evaluations.
+
+    The entries are keyed on the identity of the test and the exact values
+    of the parameter vector, so one cache may be shared between tests.
+    """
+    def __init__(self, maxsize: int = 128):
+        """maxsize: maximum number of stored evaluations"""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    @staticmethod
+    def key(uid, params):
+        """Hashable key of the parameter values of a test"""
+        names = tuple(params)
+        values = np.array([params[name].value for name in names], dtype=float)
+        return (uid, names, values.tobytes())
+
+    def get(self, key):
+        """Returns the stored evaluation or None"""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Stores an evaluation and drops the least recently used one"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Removes all evaluations and resets the counters"""
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
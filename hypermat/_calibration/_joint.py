@@ -0,0 +1,200 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+
+import numpy as np
+
+from .._profiling._profiler import phase
+from ._load import _minimize, _record
+from ._solver import newton
+
+
+class Joint():
+    """Joint calibration of one parameter set against several tests.
+
+    The deformation gradients of all tests are concatenated, so the lateral
+    stretches of every test are solved together and each objective
+    evaluation is a single `StrainEnergy` call. The material of the first
+    test is fitted and the result is copied to the materials of the others.
+    """
+    def __init__(self, tests, weights=None):
+        """tests: Uniaxial, EquiBiaxial or PureShear tests sharing a model
+
+        weights: one weight (scalar or per data point) for each test,
+        multiplying its stress residuals. Defaults to 1.
+        """
+        self.tests = list(tests)
+        if not self.tests:
+            raise ValueError('At least one test is required.')
+        self._umat = self.tests[0]._umat
+        if any(type(test._umat) is not type(self._umat) for test in self.tests):
+            raise TypeError('All tests must use the same material model.')
+        if weights is None:
+            weights = [1.0] * len(self.tests)
+        if len(weights) != len(self.tests):
+            raise ValueError('One weight is required for each test.')
+        _sizes = [test._grad.shape[2] for test in self.tests]
+        _bounds = np.cumsum([0] + _sizes)
+        self._slices = [slice(a, b) for a, b in zip(_bounds[:-1], _bounds[1:])]
+        # weights of the decimated tests multiply the test weights
+        self.weights = np.concatenate([np.broadcast_to(np.asarray(w, dtype=float), (n,))
+                                       * (1.0 if test.weights is None else test.weights)
+                                       for w, n, test in zip(weights, _sizes, self.tests)])
+        self.data = np.concatenate([test.data['stress'] for test in self.tests])
+        self._grad = np.concatenate([test._grad for test in self.tests], axis=2)
+        # per point lateral components and traction-free component of the
+        # compressible tests, the others follow the isochoric kinematics
+        self._mask = np.zeros((3, 3, _bounds[-1]), dtype=bool)
+        self._row = np.zeros(_bounds[-1], dtype=int)
+        self._col = np.zeros(_bounds[-1], dtype=int)
+        for test, sl in zip(self.tests, self._slices):
+            for i, j in test._lateral:
+                self._mask[i,j,sl] = True
+            self._row[sl], self._col[sl] = test._free
+        self._solved = np.concatenate([np.full(n, not test.incompressible)
+                                       for test, n in zip(self.tests, _sizes)])
+        self._guess = np.concatenate([test._guess(test._stretch())
+                                      for test in self.tests])
+        self.info = {}
+        self._state = None
+        self.warm_start = True
+        self.result = None
+        self.stats = {'solves':0, 'warm_starts':0, 'iterations':0,
+                      'evaluations':0, 'failures':0}
+
+    def _set_lateral(self, F, x, index=slice(None)):
+        """Sets the lateral stretches of the deformation gradients F of the
+        points `index`"""
+        F[...,0] = np.where(self._mask[:,:,index], x, F[...,0])
+
+    def _stress(self, P):
+        """Removes the hydrostatic pressure of the incompressible tests"""
+        for test, sl in zip(self.tests, self._slices):
+            if test.incompressible:
+                P[:,:,sl] = test._pressure(self._grad[:,:,sl], P[:,:,sl])
+        return P
+
+    def _lateral_system(self, x, index):
+        """Traction-free stress components and their derivatives w.r.t. the
+        lateral stretch for the points `index`"""
+        F = self._grad[:,:,index]
+        self._set_lateral(F, x, index)
+        _, P, A = self._umat.evaluate(F)
+        n = np.arange(len(index))
+        i, j = self._row[index], self._col[index]
+        r = P[i,j,n,0]
+        dr = np.einsum('kln,kln->n', A[i,j,:,:,n,0].transpose(1,2,0),
+                       self._mask[:,:,index])
+        return r, dr
+
+    def _equilibrium(self, params):
+        """Updates the parameters and solves the lateral stretches of all
+        compressible tests in one batched Newton solve"""
+        self.tests[0]._update_params(params)
+        values = tuple(params[param].value for param in params)
+        state = self._state
+        if state is None or state[0] != values:
+            lam2 = self._guess.copy()
+            index = np.flatnonzero(self._solved)
+            if index.size:
+                x0 = lam2[index]
+                if self.warm_start and state is not None and state[2]:
+                    x0 = state[1][index]
+                    self.stats['warm_starts'] += 1
+                with phase('lateral_solve'):
+                    lam2[index], self.info = newton(
+                        lambda x, active: self._lateral_system(x, index[active]), x0)
+                _record(self.stats, self.info)
+            self._state = (values, lam2, self.info.get('converged', True))
+        self._set_lateral(self._grad, self._state[1])
+        return self._state[1]
+
+    def _first_piola(self):
+        """First Piola-Kirchhoff stress of all tests"""
+        return self._stress(self._umat.jacobian(self._grad))
+
+    def _objective(self, params):
+        """Weighted stress residuals of all tests"""
+        self._equilibrium(params)
+        stress = self._first_piola()[0,0,:,0]
+        return self.weights * (self.data - stress)
+
+    def _jacobian(self, params):
+        """Sensitivities of the residuals w.r.t. the varying parameters,
+        see `Test._jacobian`"""
+        self._equilibrium(params)
+        F = self._grad
+        _, P, A = self._umat.evaluate(F)
+        n = np.arange(F.shape[2])
+        i, j = self._row, self._col
+        drdx = np.einsum('kln,kln->n', A[i,j,:,:,n,0].transpose(1,2,0), self._mask)
+        dsdx = np.einsum('kln,kln->n', A[0,0,:,:,:,0], self._mask)
+        names = [param for param in params if params[param].vary]
+        jac = np.zeros((n.size, len(names)))
+        for m, name in enumerate(names):
+            test = self.tests[0]
+            value = test._get_param(name)
+            h = np.finfo(float).eps**(1.0/3.0) * max(1.0, abs(value))
+            test._set_param(name, value + h)
+            dPdp = self._first_piola()
+            test._set_param(name, value - h)
+            dPdp = (dPdp - self._first_piola()) / (2.0 * h)
+            test._set_param(name, value)
+            dxdp = np.where(self._solved, -dPdp[i,j,n,0] / drdx, 0.0)
+            jac[:,m] = dPdp[0,0,:,0] + dsdx * dxdp
+        return -self.weights[:,None] * jac
+
+    def fit_data(self, min_values: list[int|float] = [],
+                 max_values: list[int|float] = [],
+                 variables: list[bool] = [], jacobian: bool = True,
+                 profile: bool = False):
+        """Fits the model parameters to all tests, see `Test.fit_data`
+
+        Returns the lmfit result, the fitted parameters are set on the
+        materials and lateral stretches of every test.
+        """
+        import lmfit as lm
+
+        params_dict = self._umat.kwargs.copy()
+        params_dict['K'] = self._umat._bulk
+        params = lm.Parameters()
+        for i, item in enumerate(params_dict.items()):
+            params.add(item[0], vary=variables[i], value=item[1],
+                       min=min_values[i], max=max_values[i])
+        self.result = _minimize(self._objective, self._jacobian if jacobian else None,
+                                params, profile)
+        lam2 = self._equilibrium(self.result.params)
+        for test, sl in zip(self.tests, self._slices):
+            test._update_params(self.result.params)
+            test._set_lateral(test._grad, lam2[sl])
+        return self.result
+
+    def plot_model(self, **kwargs):
+        """Plots the model strain-stress curves of all tests"""
+        for test in self.tests:
+            test.plot_model(**kwargs)
+
+    def plot(self, **kwargs):
+        """Plots the experimental stress-strain curves of all tests"""
+        for test in self.tests:
+            test.plot(**kwargs)
@@ -22,55 +22,310 @@
 """
 
 
-import lmfit as lm
+import itertools
+
 import numpy as np
-import matplotlib.pyplot as plt
 
-from scipy.optimize import fsolve
-from ._utils import init_plot
+from .._profiling._profiler import Profiler, active, phase, profile as profiling
+from ._cache import ObjectiveCache
+from ._solver import newton
+from ._utils import init_plot, decimate as _decimate
 
 
 SN = {'E':r'Engineering Strain $\epsilon_e$', r'T':'True Strain $\epsilon_t$'}
 SS = {'E':r'Engineering Stress $\sigma_e$', r'T':'True Stress $\sigma_t$'}
 
+def _minimize(objective, jacobian, params, profile=False):
+    """Least-squares fit of the parameters.
+
+    With `profile`, or inside a profile context, the objective and Jacobian
+    calls are counted and timed and the profiler is set as the `profile`
+    attribute of the result. The time spent in lmfit and scipy is recorded
+    as the 'minimizer' phase.
+    """
+    import lmfit as lm
+
+    _profiler = Profiler() if profile or active() is not None else None
+    if _profiler is not None:
+        _objective, _jacobian = objective, jacobian
+        def objective(params):
+            _profiler.count('objective_calls')
+            with phase('objective'):
+                return _objective(params)
+        if _jacobian is not None:
+            def jacobian(params):
+                _profiler.count('jacobian_calls')
+                with phase('parameter_jacobian'):
+                    return _jacobian(params)
+    minner = lm.Minimizer(objective, params)
+    kws = {'jac':jacobian} if jacobian else {}
+    if _profiler is None:
+        return minner.minimize(method='least_squares', **kws) #'least_squares', 'nelder', 'leastsq'
+    with profiling(_profiler):
+        with phase('fit'):
+            result = minner.minimize(method='least_squares', **kws)
+        _profiler.add('minimizer', _profiler.timers['fit'] - _profiler.timers['objective']
+                      - _profiler.timers.get('parameter_jacobian', 0.0))
+    result.profile = _profiler
+    return result
+
+def _record(stats, info):
+    """Accumulates the statistics of a lateral stretch solve"""
+    stats['solves'] += 1
+    stats['iterations'] += info['iterations']
+    stats['evaluations'] += info['evaluations']
+    stats['failures'] += not info['converged']
+    _profiler = active()
+    if _profiler is not None:
+        _profiler.count('lateral_solves')
+        _profiler.count('newton_iterations', info['iterations'])
+        _profiler.count('newton_point_evaluations', info['evaluations'])
+        _profiler.count('newton_failures', not info['converged'])
+
 class Test():
     """Test class"""
-    def __init__(self, umat, data, ss_type: str = 'E'):
-        """ss_type: E for Engineering and T for True"""
+    # components of the deformation gradient set to the lateral stretch and
+    # traction-free component of the stress
+    _lateral = ()
+    _free = None
+    _uid = itertools.count()
+    def __init__(self, umat, data, ss_type: str = 'E', incompressible: bool = False,
+                 cache: int|ObjectiveCache = 0, decimate: float|None = None,
+                 weighted: bool = True):
+        """ss_type: E for Engineering and T for True
+
+        incompressible: evaluate the stress on the isochoric kinematics of
+        `update_grad` with the hydrostatic pressure of the traction-free
+        condition, no lateral stretch is solved and K has no effect.
+
+        cache: size of a least-recently-used cache of the objective
+        evaluations, or an `ObjectiveCache` shared between tests. Disabled
+        by default.
+
+        decimate: fit a curvature-aware subset of the data points, within
+        this relative tolerance of the full curve, see `decimate`. The full
+        data is kept as `raw_data`. Disabled by default.
+
+        weighted: weight the residual of each kept point by the square root
+        of the number of points it represents, so that the sum of squares
+        approximates the one of the full data.
+        """
         self._umat = umat
+        self.raw_data = data
         self.data = data
+        self.weights = None
+        if decimate:
+            index, counts = _decimate(data['strain'], data['stress'], decimate)
+            self.data = {key:value[index] if np.ndim(value) else value
+                         for key, value in data.items()}
+            if weighted:
+                self.weights = np.sqrt(counts)
         self._grad = None
         self._ss_type = ss_type
+        self.incompressible = incompressible
         self._label = 'Experimental data'
-        
-    def _objective(self):
-        """Optimization function"""
+        self.info = {}
+        self._state = None
+        self.warm_start = True
+        self.stats = {'solves':0, 'warm_starts':0, 'iterations':0,
+                      'evaluations':0, 'failures':0}
+        if isinstance(cache, int):
+            cache = ObjectiveCache(cache) if cache > 0 else None
+        self.cache = cache
+        self._key = next(Test._uid)
+
+    def _stretch(self):
+        """Computes the stretch of the loading direction"""
+        e = self.data['strain']
+        return 1 + e if self._ss_type=='E' else np.exp(e)
+
+    def _guess(self, lamda):
+        """Incompressible lateral stretch"""
         raise NotImplementedError()
 
+    def _set_param(self, name, value):
+        """Sets a material parameter"""
+        if name!='K':
+            self._umat.kwargs[name] = value
+        else:
+            self._umat._bulk = value
+
+    def _get_param(self, name):
+        """Gets a material parameter"""
+        return self._umat._bulk if name=='K' else self._umat.kwargs[name]
+
+    def _update_params(self, params):
+        """Updates the material parameters"""
+        for param in params:
+            self._set_param(params[param].name, params[param].value)
+
+    def _set_lateral(self, F, x):
+        """Sets the lateral stretch of the deformation gradient"""
+        for i, j in self._lateral:
+            F[i,j,:,0] = x
+
+    def _function(self, x):
+        """Computes stress for a given stretch"""
+        self._set_lateral(self._grad, x)
+        stress = self.stress()
+        return stress
+
+    def _lateral_system(self, x, index):
+        """Computes the traction-free stress component and its derivative
+        w.r.t. the lateral stretch for the points `index`"""
+        F = self._grad[:,:,index]
+        self._set_lateral(F, x)
+        _, P, A = self._umat.evaluate(F)
+        i, j = self._free
+        r = P[i,j,:,0]
+        dr = sum(A[i,j,k,l,:,0] for k, l in self._lateral)
+        return r, dr
+
+    def _solve(self, x0):
+        """Search for the lateral stretch that gives a traction-free state"""
+        with phase('lateral_solve'):
+            lam2, self.info = newton(self._lateral_system, x0)
+        _record(self.stats, self.info)
+        return lam2
+
+    def _equilibrium(self, params):
+        """Updates the parameters and solves for the lateral stretch.
+
+        With `warm_start`, the solve starts from the converged lateral
+        stretches of the previous parameter set instead of the
+        incompressible guess.
+        """
+        self._update_params(params)
+        if self.incompressible:
+            return self._guess(self._stretch())
+        values = tuple(params[param].value for param in params)
+        state = self._state
+        if state is None or state[0] != values:
+            x0 = self._guess(self._stretch())
+            if self.warm_start and state is not None and state[2] \
+                and state[1].shape == x0.shape:
+                x0 = state[1]
+                self.stats['warm_starts'] += 1
+            lam2 = self._solve(x0)
+            self._state = (values, lam2, self.info['converged'])
+        return self._state[1]
+
+    def _objective(self, params):
+        """Optimization function"""
+        if self.cache is not None:
+            key = self.cache.key(self._key, params)
+            value = self.cache.get(key)
+            _profiler = active()
+            if _profiler is not None:
+                _profiler.count('cache_hits' if value is not None else 'cache_misses')
+            if value is not None:
+                # restore the solved state of the stored evaluation
+                residual, lam2, converged = value
+                self._update_params(params)
+                self._set_lateral(self._grad, lam2)
+                self._state = (tuple(params[param].value for param in params),
+                               lam2, converged)
+                return residual.copy()
+        lam2 = self._equilibrium(params)
+        stress = self._function(lam2)[0,0,...].ravel()
+        residual = abs(self.data['stress'] - stress)
+        if self.weights is not None:
+            residual *= self.weights
+        if self.cache is not None:
+            converged = self.incompressible or self._state[2]
+            self.cache.put(key, (residual.copy(), np.array(lam2), converged))
+        return residual
+
+    def _jacobian(self, params):
+        """Sensitivities of the residuals w.r.t. the varying parameters.
+
+        The lateral stretch depends on the parameters through the
+        traction-free condition r(x, p) = 0, so by implicit differentiation
+        dx/dp = -(∂r/∂p) / (∂r/∂x). The partial derivatives of the stress
+        w.r.t. the parameters are central differences at fixed kinematics,
+        which need stress evaluations only and no lateral solve.
+        """
+        lam2 = self._equilibrium(params)
+        self._set_lateral(self._grad, lam2)
+        F = self._grad
+        if self.incompressible:
+            P = self._first_piola()
+        else:
+            _, P, A = self._umat.evaluate(F)
+            i, j = self._free
+            drdx = sum(A[i,j,k,l,:,0] for k, l in self._lateral)
+            dsdx = sum(A[0,0,k,l,:,0] for k, l in self._lateral)
+        names = [param for param in params if params[param].vary]
+        jac = np.zeros((lam2.size, len(names)))
+        for n, name in enumerate(names):
+            value = self._get_param(name)
+            h = np.finfo(float).eps**(1.0/3.0) * max(1.0, abs(value))
+            self._set_param(name, value + h)
+            dPdp = self._first_piola()
+            self._set_param(name, value - h)
+            dPdp = (dPdp - self._first_piola()) / (2.0 * h)
+            self._set_param(name, value)
+            jac[:,n] = dPdp[0,0,:,0]
+            if not self.incompressible:
+                dxdp = -dPdp[i,j,:,0] / drdx
+                jac[:,n] += dsdx * dxdp
+        stress = P[0,0,:,0]
+        if self.weights is not None:
+            jac *= self.weights[:,None]
+        return -np.sign(self.data['stress'] - stress)[:,None] * jac
+
+    def _pressure(self, F, P):
+        """Removes the hydrostatic pressure p F⁻ᵀ of the traction-free
+        condition from the stress of incompressible tests"""
+        if not self.incompressible:
+            return P
+        i, j = self._free
+        p = P[i,j] * F[i,j]
+        return P - p * np.swapaxes(np.linalg.inv(F.T).T, 0, 1)
+
+    def _first_piola(self):
+        """Computes the first Piola-Kirchhoff stress tensor"""
+        return self._pressure(self._grad, self._umat.jacobian(self._grad))
+
     def stress(self):
         """Computes stress tensor"""
         if self._ss_type=='E':
-            _stress = self._umat.jacobian(self._grad)
+            _stress = self._first_piola()
         elif self._ss_type=='T':
             _stress = np.einsum('...,...ij->...ij', np.det(self._grad),
-                               self._umat.jacobian(self._grad) @ self._grad)
+                               self._first_piola() @ self._grad)
         return _stress
 
     def fit_data(self, min_values: list[int|float] = [],
                  max_values: list[int|float] = [],
-                 variables: list[bool] = []):
-        """Fits model parameters with the experimental data"""
+                 variables: list[bool] = [], jacobian: bool = True,
+                 profile: bool = False):
+        """Fits model parameters with the experimental data
+
+        jacobian: use the parameter sensitivities of `_jacobian` instead of
+        finite differences of the whole objective. The sensitivities are of
+        the engineering stress, so True stress data always uses finite
+        differences.
+
+        profile: record the counters and phase times of the fit in the
+        `profile` attribute of the result, see `hypermat.profile`.
+        """
+        import lmfit as lm
+
         params_dict = self._umat.kwargs.copy()
         params_dict['K'] = self._umat._bulk
         params = lm.Parameters()
         for i, item in enumerate(params_dict.items()):
             params.add(item[0], vary=variables[i], value=item[1],
                        min=min_values[i], max=max_values[i])
-        minner = lm.Minimizer(self._objective, params)
-        result = minner.minimize(method='least_squares') #'least_squares', 'nelder', 'leastsq'
+        jacobian = jacobian and self._ss_type == 'E'
+        return _minimize(self._objective, self._jacobian if jacobian else None,
+                         params, profile)
 
     def plot_model(self, **kwargs):
         """Plots model strain-stress curve"""
+        import matplotlib.pyplot as plt
+
         _stress = self.stress()[0,0,...].ravel()
         _strain = self.data['strain']
         init_plot()
@@ -79,8 +334,10 @@ class Test():
 
     def plot(self, **kwargs):
         """Plots experimental stress-strain curve"""
-        _stress = self.data['stress']
-        _strain = self.data['strain']
+        import matplotlib.pyplot as plt
+
+        _stress = self.raw_data['stress']
+        _strain = self.raw_data['strain']
         init_plot()
         plt.gca().plot(_strain, _stress, label='Experimental data', **kwargs)
         plt.gca().set_xlabel(SN[self._ss_type])
@@ -89,33 +346,16 @@ class Test():
 
 class Uniaxial(Test):
     """Compressible uniaxial loading."""
+    _lateral = ((1, 1), (2, 2))
+    _free = (1, 1)
     def __init__(self, umat, data, **kwds):
         super().__init__(umat, data, **kwds)
         self._grad = self.update_grad()
         self._label = 'Uniaxial (%s)'%(self._umat._label) 
 
-    def _function(self, x):
-        """Computes stress for a given stretch"""
-        F = self._grad
-        F[1,1,:,0] = F[2,2,:,0] = x
-        stress = self.stress()
-        return stress
-
-    def _objective(self, params):
-        """Optimization function"""
-        e = self.data['strain']
-        lamda = 1 + e if self._ss_type=='E' else np.exp(e)
-        for param in params:
-            if params[param].name!='K':
-                self._umat.kwargs[params[param].name] = params[param].value
-            else:
-                self._umat._bulk = params[param].value
-        def calcS22Abs(x):
-            return abs(self._function(x)[1,1,...].ravel())
-        # search for transverse stretch that gives S22=0
-        lam2 = fsolve(calcS22Abs, x0=1.0/np.sqrt(lamda))
-        stress = self._function(lam2)[0,0,...].ravel()
-        return abs(self.data['stress'] - stress)
+    def _guess(self, lamda):
+        """Incompressible lateral stretch"""
+        return 1.0/np.sqrt(lamda)
 
     def update_grad(self):
         """Update deformation gradient"""
@@ -129,33 +369,16 @@ class Uniaxial(Test):
 
 class EquiBiaxial(Test):
     """Compressible biaxial loading"""
+    _lateral = ((2, 2),)
+    _free = (2, 2)
     def __init__(self, umat, data, **kwds):
         super().__init__(umat, data, **kwds)
         self._grad = self.update_grad()
         self._label = 'Equibiaxial (%s)'%(self._umat._label) 
 
-    def _function(self, x):
-        """Computes stress for a given stretch"""
-        F = self._grad
-        F[2,2,:,0] = x
-        stress = self.stress()
-        return stress
-
-    def _objective(self, params):
-        """Optimization function"""
-        e = self.data['strain']
-        lamda = 1 + e if self._ss_type=='E' else np.exp(e)
-        for param in params:
-            if params[param].name!='K':
-                self._umat.kwargs[params[param].name] = params[param].value
-            else:
-                self._umat._bulk = params[param].value
-        def calcS22Abs(x):
-            return abs(self._function(x)[2,2,...].ravel())
-        # search for transverse stretch that gives S33=0
-        lam2 = fsolve(calcS22Abs, x0=1.0/np.square(lamda))
-        stress = self._function(lam2)[0,0,...].ravel()
-        return abs(self.data['stress'] - stress)
+    def _guess(self, lamda):
+        """Incompressible lateral stretch"""
+        return 1.0/np.square(lamda)
 
     def update_grad(self):
         """Update deformation gradient"""
@@ -169,33 +392,16 @@ class EquiBiaxial(Test):
 
 class PureShear(Test):
     """Compressible planar loading."""
+    _lateral = ((2, 2),)
+    _free = (2, 2)
     def __init__(self, umat, data, **kwds):
         super().__init__(umat, data, **kwds)
         self._grad = self.update_grad()
         self._label = 'Pure shear (%s)'%(self._umat._label) 
 
-    def _function(self, x):
-        """Computes stress for a given stretch"""
-        F = self._grad
-        F[2,2,:,0] = x
-        stress = self.stress()
-        return stress
-
-    def _objective(self, params):
-        """Optimization function"""
-        e = self.data['strain']
-        lamda = 1 + e if self._ss_type=='E' else np.exp(e)
-        for param in params:
-            if params[param].name!='K':
-                self._umat.kwargs[params[param].name] = params[param].value
-            else:
-                self._umat._bulk = params[param].value
-        def calcS22Abs(x):
-            return abs(self._function(x)[2,2,...].ravel())
-        # search for transverse stretch that gives S33=0
-        lam2 = fsolve(calcS22Abs, x0=1.0/lamda)
-        stress = self._function(lam2)[0,0,...].ravel()
-        return abs(self.data['stress'] - stress)
+    def _guess(self, lamda):
+        """Incompressible lateral stretch"""
+        return 1.0/lamda
 
     def update_grad(self):
         """Update deformation gradient"""
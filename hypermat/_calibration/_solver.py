@@ -0,0 +1,75 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+
+import numpy as np
+
+
+def newton(func, x0, tol: float = 1.0e-10, maxiter: int = 50):
+    """Solve independent scalar equations r(x) = 0 point by point.
+
+    All points are iterated in a single batched call of `func` per Newton
+    iteration, converged points are dropped from the following calls. Points
+    which do not converge are restarted once from a continuation predictor,
+    interpolated between the converged neighbouring points.
+
+    Args:
+        func (callable): func(x, index) returns the residuals r and the
+            derivatives dr/dx for the points `index` at the values `x`.
+        x0 (np.ndarray): Initial values.
+        tol (float): Relative tolerance on the Newton update. Defaults to 1e-10.
+        maxiter (int): Maximum number of iterations. Defaults to 50.
+
+    Returns:
+        tuple: Solution and a dict with the number of 'iterations', of point
+        'evaluations' and the 'converged' flag.
+    """
+    _x = np.array(x0, dtype=float).ravel()
+    _converged = np.zeros(_x.size, dtype=bool)
+    _active = np.arange(_x.size)
+    _iterations = _evaluations = 0
+    for _restart in range(2):
+        for _ in range(maxiter):
+            if not _active.size:
+                break
+            _r, _dr = func(_x[_active], _active)
+            _iterations += 1
+            _evaluations += _active.size
+            with np.errstate(divide='ignore', invalid='ignore'):
+                _dx = -np.asarray(_r) / np.asarray(_dr)
+            _finite = np.isfinite(_dx)
+            _dx[~_finite] = 0.0
+            _xa = _x[_active]
+            # stretches stay positive
+            _xn = np.where(_xa + _dx > 0.0, _xa + _dx, 0.5 * _xa)
+            _x[_active] = _xn
+            _done = _finite & (np.abs(_dx) <= tol * np.abs(_xn))
+            _converged[_active[_done]] = True
+            _active = _active[~_done]
+        if not _active.size or _restart or not _converged.any():
+            break
+        # continuation predictor from the converged neighbouring points
+        _index = np.flatnonzero(_converged)
+        _x[_active] = np.interp(_active, _index, _x[_index])
+    return _x, {'iterations':_iterations, 'evaluations':_evaluations,
+                'converged':bool(_converged.all())}
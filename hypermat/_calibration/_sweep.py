@@ -0,0 +1,110 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+
+import copy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ._load import Uniaxial
+
+
+def _fit(job):
+    """Fits one start of one candidate model, runs in a worker process"""
+    index, umat, start, bounds, test, data, kwds = job
+    umat = copy.deepcopy(umat)
+    for name, value in start.items():
+        if name!='K':
+            umat.kwargs[name] = value
+        else:
+            umat._bulk = value
+    _test = test(umat, data, **kwds)
+    _time = time.perf_counter()
+    result = _test.fit_data(*bounds)
+    return {'index':index, 'model':umat._label, 'params':result.params.valuesdict(),
+            'chisqr':result.chisqr, 'aic':result.aic, 'bic':result.bic,
+            'nfev':result.nfev, 'success':result.success,
+            'time':time.perf_counter() - _time}
+
+def _starts(umat, bounds, starts, rng):
+    """Initial parameters: the values of the model, then random values
+    inside the bounds of the varying parameters"""
+    params = dict(umat.kwargs, K=umat._bulk)
+    values = [params]
+    for _ in range(starts - 1):
+        start = params.copy()
+        for (name, value), low, high, vary in zip(params.items(), *bounds):
+            if vary and np.isfinite(low) and np.isfinite(high):
+                start[name] = rng.uniform(low, high)
+        values.append(start)
+    return values
+
+def sweep(candidates, data, test=Uniaxial, starts: int = 1,
+          workers: int|None = None, rank: str = 'aic', seed=None, **kwds):
+    """Fits several models to the same data concurrently and ranks them.
+
+    Args:
+        candidates (list): Tuples (umat, min_values, max_values, variables)
+            with the arguments of `Test.fit_data` for each model.
+        data (dict): Experimental data, see `to_dict`.
+        test (type): Loading type. Defaults to Uniaxial.
+        starts (int): Number of starts per model, the first one from the
+            parameters of the model and the others random inside the bounds.
+            Defaults to 1.
+        workers (int): Number of processes, all CPUs if None and serial in
+            the current process if 0. Defaults to None.
+        rank (str): Ranking criterion, 'aic', 'bic' or 'chisqr'. Defaults
+            to 'aic'.
+        seed (int): Seed of the random starts. Defaults to None.
+        **kwds: Keyword arguments of the test, e.g. `incompressible`.
+
+    Returns:
+        list: Best start of each model as dicts with 'model', 'params',
+        'chisqr', 'aic', 'bic', 'nfev', 'success', 'time' (of the best start),
+        'total_time' (of all starts) and 'starts', sorted by `rank`.
+    """
+    if rank not in ('aic', 'bic', 'chisqr'):
+        raise ValueError("Unknown rank '%s', use 'aic', 'bic' or 'chisqr'."%(rank))
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for index, (umat, *bounds) in enumerate(candidates):
+        for start in _starts(umat, bounds, starts, rng):
+            jobs.append((index, umat, start, bounds, test, data, kwds))
+    if workers == 0:
+        fits = list(map(_fit, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            fits = list(pool.map(_fit, jobs))
+    table = {}
+    for fit in fits:
+        best = table.get(fit['index'])
+        if best is None or fit[rank] < best[rank]:
+            fit['total_time'] = fit['time'] + (best['total_time'] if best else 0.0)
+            fit['starts'] = starts
+            table[fit['index']] = fit
+        else:
+            best['total_time'] += fit['time']
+    return sorted(table.values(), key=lambda fit: fit[rank])
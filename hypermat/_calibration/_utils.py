@@ -22,22 +22,141 @@
 """
 
 
+import hashlib
+import itertools
+import os
+from pathlib import Path
+
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
+
+
+# keywords of `read_file` handled by the chunked parser, the others fall
+# back to `np.genfromtxt`
+_PARSER = ('delimiter', 'comments', 'skip_header', 'usecols', 'dtype')
+_CHUNK = 1 << 16
 
 def init_plot():
     """Initialize plot"""
+    import matplotlib
+    import matplotlib.pyplot as plt
+
     matplotlib.rcParams['font.family'] = ['Times New Roman']
     plt.minorticks_on()
     plt.gca().grid(which='major', color='#808080')
     plt.gca().grid(which='minor', color='#C0C0C0')
 
-def read_file(file_path, **kwds):
-    """Read csv, txt files"""
-    out = np.genfromtxt(file_path, **kwds)
+def _parse(file_path, delimiter=None, comments='#', skip_header=0,
+           usecols=None, dtype=float):
+    """Parse a text file in chunks of lines with the C parser of `np.loadtxt`.
+
+    Chunks which do not parse as numbers (headers, empty fields) are parsed
+    with `np.genfromtxt`, which sets the invalid values to NaN.
+    """
+    chunks = []
+    with open(file_path) as file:
+        lines = itertools.islice(file, skip_header, None)
+        while True:
+            chunk = list(itertools.islice(lines, _CHUNK))
+            if not chunk:
+                break
+            try:
+                out = np.loadtxt(chunk, delimiter=delimiter, comments=comments,
+                                 usecols=usecols, dtype=dtype, ndmin=2)
+            except ValueError:
+                out = np.genfromtxt(chunk, delimiter=delimiter, comments=comments,
+                                    usecols=usecols, dtype=dtype)
+                out = out.reshape(-1, out.shape[-1]) if out.ndim else out.reshape(1, 1)
+            if out.size:
+                chunks.append(out)
+    return np.concatenate(chunks)
+
+def _cache_path(file_path, cache_dir, kwds):
+    """Cache file of the parsed data, keyed on the file path, size and
+    modification time and on the parser keywords"""
+    stat = os.stat(file_path)
+    key = repr((str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns,
+                sorted((name, repr(value)) for name, value in kwds.items())))
+    digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    return Path(cache_dir) / ('%s.npy'%(digest))
+
+def read_file(file_path, cache: bool|str = False, **kwds):
+    """Read csv, txt files
+
+    The file is parsed in chunks with a fast parser for the keywords
+    delimiter, comments, skip_header, usecols and dtype, other keywords of
+    `np.genfromtxt` are passed to it. Values which are not numbers are
+    removed and the data is returned with contiguous columns, so that
+    `to_dict` returns the columns without copies.
+
+    cache: store the parsed columns in a binary .npy file, in the directory
+    `cache` or in `.hypermat_cache` next to the file if True. Later calls
+    with the unchanged file (same path, size and modification time) map the
+    stored columns into memory (copy-on-write) instead of parsing.
+    """
+    if cache:
+        cache_dir = Path(file_path).parent / '.hypermat_cache' if cache is True else cache
+        cache_file = _cache_path(file_path, cache_dir, kwds)
+        if cache_file.exists():
+            return np.load(cache_file, mmap_mode='c').T
+    if set(kwds) <= set(_PARSER):
+        out = _parse(file_path, **kwds)
+    else:
+        out = np.genfromtxt(file_path, **kwds)
     ncols = out.shape[1]
-    return out[~np.isnan(out)].reshape(-1,ncols)
+    # columns first, the transpose has contiguous columns
+    out = np.ascontiguousarray(out[~np.isnan(out)].reshape(-1,ncols).T)
+    if cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        _tmp = cache_file.with_suffix('.tmp.npy')
+        np.save(_tmp, out)
+        os.replace(_tmp, cache_file)
+        return np.load(cache_file, mmap_mode='c').T
+    return out.T
+
+def decimate(strain, stress, tol: float = 1.0e-3):
+    """Curvature-aware subset of the points of a stress-strain curve.
+
+    The points are selected by the Ramer-Douglas-Peucker algorithm on the
+    curve scaled to the unit square, so every removed point is within `tol`
+    (relative to the ranges of strain and stress) of the polyline through
+    the kept points. Nearly straight parts keep few points and curved parts
+    keep many. The tolerance should be larger than the noise of the data.
+
+    Args:
+        strain (np.ndarray): Strain values.
+        stress (np.ndarray): Stress values.
+        tol (float): Relative distance tolerance. Defaults to 1e-3.
+
+    Returns:
+        tuple: Indices of the kept points and the number of points each of
+        them represents.
+    """
+    n = len(strain)
+    if n < 3:
+        return np.arange(n), np.ones(n, dtype=int)
+    x = (strain - np.min(strain)) / (np.ptp(strain) or 1.0)
+    y = (stress - np.min(stress)) / (np.ptp(stress) or 1.0)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n-1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        dx, dy = x[j] - x[i], y[j] - y[i]
+        px, py = x[i+1:j] - x[i], y[i+1:j] - y[i]
+        length = dx*dx + dy*dy
+        t = np.clip((px*dx + py*dy) / length, 0.0, 1.0) if length else 0.0
+        distance = np.hypot(px - t*dx, py - t*dy)
+        k = np.argmax(distance)
+        if distance[k] > tol:
+            m = i + 1 + k
+            keep[m] = True
+            stack += [(i, m), (m, j)]
+    index = np.flatnonzero(keep)
+    # each kept point represents the points up to the midpoints to its neighbours
+    bounds = np.concatenate([[0], (index[:-1] + index[1:] + 1) // 2, [n]])
+    return index, np.diff(bounds)
 
 def to_dict(data, keys):
     """Create a dictionary with the given data and keys."""
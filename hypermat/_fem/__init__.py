@@ -0,0 +1,4 @@
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""Finite element Module"""
+from ._element import ElementIntegrals, integrate
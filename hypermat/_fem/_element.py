@@ -0,0 +1,112 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .._profiling._profiler import phase
+
+
+ElementIntegrals = namedtuple('ElementIntegrals', ['energy', 'forces', 'stiffness'])
+ElementIntegrals.__doc__ = """Strain energy, internal force vectors and stiffness
+matrices of a batch of elements"""
+
+
+def integrate(umat, dNdX, dV, u, stiffness: bool = True, chunk_size=None,
+              workers=None):
+    """Integrate the strain energy, the internal forces and the stiffness of
+    a batch of elements.
+
+    The deformation gradient F = 1 + u ⊗ dN/dX is evaluated at all
+    quadrature points, the stress and the tangent are obtained in a single
+    pass and contracted with the shape function gradients element-wise:
+
+        r_ai = ∫ P_iJ dN_a/dX_J dV
+        K_aibk = ∫ dN_a/dX_J A_iJkL dN_b/dX_L dV
+
+    The elements are processed in blocks of `chunk_size`, so the stress and
+    the tangent of the quadrature points only exist for one block at a time.
+
+    Args:
+        umat (StrainEnergy): Material model.
+        dNdX (np.ndarray): Shape function gradients w.r.t. the undeformed
+            coordinates with shape (nnodes, 3, ngp, nel).
+        dV (np.ndarray): Quadrature weights times the Jacobian determinant
+            of the undeformed element with shape (ngp, nel).
+        u (np.ndarray): Nodal displacements with shape (nnodes, 3, nel).
+        stiffness (bool): Integrate the stiffness matrices. Defaults to True.
+        chunk_size (int): Number of elements integrated at once. Defaults to
+            None (all at once, or one block per worker).
+        workers (int): Number of threads integrating the blocks in parallel,
+            -1 for all CPUs. Defaults to None (serial).
+
+    Returns:
+        ElementIntegrals: Named tuple (energy, forces, stiffness) with shapes
+        (nel,), (nnodes, 3, nel) and (nnodes, 3, nnodes, 3, nel). The
+        stiffness is None if not requested.
+    """
+    if workers is not None and workers < 0:
+        workers = os.cpu_count() or 1
+    dNdX, dV, u = np.asarray(dNdX), np.asarray(dV), np.asarray(u)
+    nnodes, _, ngp, nel = dNdX.shape
+    dtype = np.result_type(umat.dtype or float, dNdX, dV, u)
+    params = umat._parameters()
+    batch = (ngp, nel)
+    if np.broadcast_shapes(batch, *[np.shape(value) for value in params.values()]) != batch:
+        raise ValueError('Material parameters must broadcast against the '
+                         'quadrature points (ngp, nel) of the elements.')
+    if chunk_size is None:
+        chunk_size = -(-nel // (workers or 1))
+    chunk_size = max(1, int(chunk_size))
+    energy = np.empty(nel, dtype=dtype)
+    forces = np.empty((nnodes, 3, nel), dtype=dtype)
+    matrices = np.empty((nnodes, 3, nnodes, 3, nel), dtype=dtype) if stiffness else None
+    def _run(start):
+        sl = np.s_[..., start:start+chunk_size]
+        _dNdX, _dV = dNdX[sl], dV[sl]
+        with phase('kinematics'):
+            F = np.einsum('aic,aJqc->iJqc', u[sl], _dNdX)
+            for i in range(3):
+                F[i,i] += 1.0
+        _energy, P, A = umat._block(F, stiffness, 'full', umat._slice(params, batch, sl))
+        with phase('integration'):
+            # the quadrature weights are applied once to the test functions
+            _dNdV = _dNdX * _dV
+            energy[sl] = np.einsum('qc,qc->c', _energy, _dV)
+            forces[sl] = np.einsum('iJqc,aJqc->aic', P, _dNdV)
+            if stiffness:
+                # contract the tangent with the trial functions first, the
+                # intermediate is (3, 3, 3, nnodes) per quadrature point
+                AB = np.einsum('iJkLqc,bLqc->iJkbqc', A, _dNdV)
+                matrices[sl] = np.einsum('aJqc,iJkbqc->aibkc', _dNdX, AB)
+    starts = range(0, nel, chunk_size)
+    if workers and workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_run, starts))
+    else:
+        for start in starts:
+            _run(start)
+    return ElementIntegrals(energy, forces, matrices)
@@ -2,5 +2,8 @@
 
 """Material Formulations Module"""
 
-from ._energy import StrainEnergy
+from ._energy import StrainEnergy, Evaluation
+from ._incremental import IncrementalEvaluator
+from ._multi import MultiMaterial
 from ._material import *
+from ._tangent import material_tangent, pack_tangent, unpack_tangent, apply_tangent
@@ -20,42 +20,259 @@
     along with this program; if not, write to the Free Software
     Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import tensortrax as tr
 
 from .._ad._deformation import Deformation
+from .._ad._invariants import Invariants
+from .._ad._stretches import Stretches
+from .._profiling._profiler import active, phase
 from ._utils import volumetric
+from ._tangent import material_tangent, pack_tangent, _check
+
+
+Evaluation = namedtuple('Evaluation', ['energy', 'stress', 'tangent'])
+Evaluation.__doc__ = """Strain energy W, stress P = dW/dF and tangent A = d²W/dF²"""
+
+
+def _zero(dtype):
+    """Threshold below which the results are set to zero, 1e-13 in double
+    precision and scaled with the machine epsilon otherwise."""
+    return 1.0e-13 * np.finfo(dtype).eps / np.finfo(np.float64).eps
 
 
 class StrainEnergy():
-    """Strain energy class"""
+    """Strain energy class
+
+    The derivatives are evaluated either on the full hyper-dual deformation
+    gradient ('tensor') or by the chain rule on the scalar derivatives of
+    W(J1, J2, J3) ('invariants') or of W(c1, c2, c3) on the closed-form
+    eigenvalues c_a of C ('stretches'). The default `method='auto'` selects
+    the chain rule matching the kinematics of the built-in models. Custom
+    strain energy functions use the tensor method (the reference
+    implementation) unless a chain rule is selected explicitly.
+
+    The floating point precision of the evaluation is set by `dtype`
+    (default float64). With `dtype=np.float32` the deformation gradient,
+    the material parameters and the results are single precision and the
+    zero threshold of the results is scaled with the machine epsilon.
+
+    Material parameters may be arrays which broadcast against the batch axes
+    of the deformation gradient, so many parameter sets are evaluated in one
+    call, e.g. C10 of shape (n, 1, 1) adds a leading batch axis of size n.
+    """
+    _kinematics = 'tensor'
     def __init__(self, func, *args, **kwargs):
         super().__init__()
         self.iso_func = func
         self.vol_func = volumetric
         self.args = args
         self.kwargs = kwargs
+        self.method = 'auto'
+        self.dtype = None
         self._bulk = 0
         if 'K' in self.kwargs:
             self._bulk = self.kwargs.pop('K')
-    def jacobian(self, _x):
-        "Calculate the first Piola-Kirchoff stress tensor: P = dW/dF"
-        _x = Deformation(_x)
-        _dwdf =  tr.Δ(self.iso_func(_x, **self.kwargs))
-        if self._bulk:
-            kwargs = {'K':self._bulk}
-            _dwvdf =  tr.Δ(self.vol_func(_x, **kwargs))
-            _dwdf += _dwvdf
-        _dwdf[np.abs(_dwdf)<1.0e-13]=0.0
-        return _dwdf[0,0]
-    def hessian(self, _x):
-        """Calculate the fourth-order elasticity tensor A = d²W/dF²"""
-        _x = Deformation(_x)
-        _ddwdfdf =  tr.Δδ(self.iso_func(_x, **self.kwargs))
-        if self._bulk:
-            kwargs = {'K':self._bulk}
-            _ddwvdfdf =  tr.Δδ(self.vol_func(_x, **kwargs))
-            _ddwdfdf += _ddwvdfdf
-        _ddwdfdf[np.abs(_ddwdfdf)<1.0e-13]=0.0
-        return _ddwdfdf
+    def _cast(self, _value):
+        """Cast a material parameter to the precision of the evaluation"""
+        if self.dtype is None and np.ndim(_value) == 0:
+            return _value
+        return np.asarray(_value, dtype=self.dtype or float)[()]
+    def _parameters(self):
+        """Material parameters of the isochoric and volumetric parts"""
+        params = {_key:self._cast(_value) for _key, _value in self.kwargs.items()}
+        params['K'] = self._cast(self._bulk)
+        return params
+    def _broadcast(self, _x, params):
+        """Broadcast the deformation gradient against the material parameters.
+
+        Parameter arrays broadcast against the batch (trailing) axes of the
+        deformation gradient with the numpy rules, e.g. a parameter of shape
+        (n, 1, 1) evaluates n parameter sets on F of shape (3, 3, ngp, nel).
+        """
+        _shapes = [np.shape(_value) for _value in params.values()]
+        if not any(_shapes):
+            return _x
+        _x = np.asarray(_x)
+        _batch = np.broadcast_shapes(_x.shape[2:], *_shapes)
+        _x = _x.reshape(_x.shape[:2] + (1,)*(len(_batch) + 2 - _x.ndim) + _x.shape[2:])
+        return np.broadcast_to(_x, _x.shape[:2] + _batch)
+    @staticmethod
+    def _slice(params, _batch, _slice):
+        """Material parameters of a block of the batch axes"""
+        return {_key:np.broadcast_to(_value, _batch)[_slice] if np.ndim(_value)
+                else _value for _key, _value in params.items()}
+    def _energy(self, _x, params):
+        """Build the total strain energy graph W = W_iso + W_vol"""
+        kwargs = dict(params)
+        _bulk = kwargs.pop('K')
+        _w = self.iso_func(_x, **kwargs)
+        if np.any(_bulk):
+            _w += self.vol_func(_x, K=_bulk)
+        return _w
+    def _evaluate(self, _x, hessian=True, params=None):
+        """Evaluate the energy, the stress and (optionally) the tangent"""
+        if params is None:
+            params = self._parameters()
+        method = self.method
+        if method == 'auto':
+            method = self._kinematics
+        if method in ('invariants', 'stretches'):
+            with phase('kinematics'):
+                _kinematics = Invariants if method == 'invariants' else Stretches
+                _x = _kinematics(_x, hessian=hessian, dtype=self.dtype)
+            with phase('energy'):
+                try:
+                    _w = self._energy(_x, params)
+                except (AttributeError, TypeError, ValueError) as _error:
+                    raise ValueError("The strain energy function needs kinematics "
+                                     "which are not supported by method '%s', use "
+                                     "method='tensor'."%(method)) from _error
+            with phase('derivatives'):
+                return _x.evaluate(_w)
+        if method != 'tensor':
+            raise ValueError("Unknown method '%s', use 'auto', 'invariants', "
+                             "'stretches' or 'tensor'."%(method))
+        _shape = np.shape(_x)[2:]
+        with phase('kinematics'):
+            _x = Deformation(_x, hessian=hessian, dtype=self.dtype)
+        with phase('energy'):
+            _w = self._energy(_x, params)
+        with phase('derivatives'):
+            _energy = np.reshape(tr.f(_w), _shape)
+            if not hessian:
+                return _energy, tr.δ(_w), None
+            return _energy, tr.Δ(_w)[0,0], tr.Δδ(_w)
+    def _tangent(self, _x, _dwdf, _ddwdfdf, storage):
+        """Convert the tangent to the requested storage"""
+        if storage in ('voigt', 'mandel'):
+            _ddwdfdf = material_tangent(np.asarray(_x, dtype=_dwdf.dtype), _dwdf,
+                                        _ddwdfdf)
+        return pack_tangent(_ddwdfdf, storage)
+    def _block(self, _x, hessian, storage, params):
+        """Evaluate one block of deformation gradients"""
+        _energy, _dwdf, _ddwdfdf = self._evaluate(_x, hessian, params)
+        _tol = _zero(_dwdf.dtype)
+        if hessian:
+            with phase('storage'):
+                _ddwdfdf = self._tangent(_x, _dwdf, _ddwdfdf, storage)
+        with phase('threshold'):
+            if hessian:
+                _ddwdfdf[np.abs(_ddwdfdf)<_tol]=0.0
+            _dwdf[np.abs(_dwdf)<_tol]=0.0
+        return [_energy, _dwdf, _ddwdfdf]
+    def _stream(self, _x, hessian, storage, out, chunk_size, workers=None):
+        """Evaluate the deformation gradients in blocks of `chunk_size`
+        elements along the last axis and write the results into `out`.
+        The blocks are distributed on a pool of `workers` threads."""
+        _check(storage)
+        if workers is not None and workers < 0:
+            workers = os.cpu_count() or 1
+        params = self._parameters()
+        _x = self._broadcast(_x, params)
+        _profiler = active()
+        if _profiler is not None:
+            _profiler.count('evaluations')
+            _profiler.count('points', int(np.prod(np.shape(_x)[2:])))
+        if out is None and chunk_size is None and not workers:
+            return self._block(_x, hessian, storage, params)
+        if np.ndim(_x) == 2:
+            # a single deformation gradient has no batch axis to split
+            _results = self._block(_x, hessian, storage, params)
+            out = [None]*3 if out is None else list(out)
+            for _i, _result in enumerate(_results):
+                if _result is None or (_i == 0 and not hessian):
+                    continue
+                if out[_i] is None:
+                    out[_i] = _result
+                else:
+                    out[_i][...] = _result
+            return out
+        _x = np.asarray(_x)
+        _batch = _x.shape[2:]
+        _n = _x.shape[-1]
+        if chunk_size is None:
+            chunk_size = -(-_n // (workers or 1))
+        chunk_size = max(1, int(chunk_size))
+        out = [None]*3 if out is None else list(out)
+        _lock = threading.Lock()
+        def _run(_start):
+            _slice = np.s_[..., _start:_start+chunk_size]
+            _params = self._slice(params, _batch, _slice)
+            _results = self._block(_x[_slice], hessian, storage, _params)
+            for _i, _result in enumerate(_results):
+                if _result is None or (_i == 0 and not hessian):
+                    continue
+                with _lock:
+                    if out[_i] is None:
+                        out[_i] = np.empty(_result.shape[:-1] + (_n,), dtype=_result.dtype)
+                out[_i][_slice] = _result
+        _starts = range(0, _n, chunk_size)
+        if workers and workers > 1 and len(_starts) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as _pool:
+                list(_pool.map(_run, _starts))
+        else:
+            for _start in _starts:
+                _run(_start)
+        return out
+    def jacobian(self, _x, out=None, chunk_size=None, workers=None):
+        """Calculate the first Piola-Kirchoff stress tensor: P = dW/dF
+
+        Args:
+            _x (Iterable): Deformation gradient values.
+            out (np.ndarray): Preallocated output array of shape (3, 3, ...).
+            chunk_size (int): Number of elements (entries of the last axis)
+                evaluated at once. Bounds the memory of the intermediate
+                (hyper-)dual data. Defaults to None (all at once, or one
+                block per worker).
+            workers (int): Number of threads evaluating the blocks in
+                parallel, -1 for all CPUs. The results are written in place
+                into the output arrays. Defaults to None (serial).
+        """
+        return self._stream(_x, False, 'full', (None, out, None), chunk_size,
+                            workers)[1]
+    def hessian(self, _x, storage: str = 'full', out=None, chunk_size=None,
+                workers=None):
+        """Calculate the fourth-order elasticity tensor A = d²W/dF²
+
+        Args:
+            _x (Iterable): Deformation gradient values.
+            storage (str): 'full' for the dense A, 'major' for the 45 upper
+                triangle components of A (major symmetry), 'voigt' or 'mandel'
+                for the 21 components of the material tangent ℂ = 4 d²W/dCdC.
+                The packed components are the upper triangle of the 9x9 or
+                6x6 matrix in row-major order, with the Voigt/Mandel index
+                pairs ordered 11, 22, 33, 12, 23, 13 (not 23, 13, 12). See
+                `unpack_tangent` and `apply_tangent`. Defaults to 'full'.
+            out (np.ndarray): Preallocated output array for the tangent.
+            chunk_size (int): Number of elements evaluated at once, see
+                `jacobian`. Defaults to None.
+            workers (int): Number of threads, see `jacobian`. Defaults to None.
+        """
+        return self._stream(_x, True, storage, (None, None, out), chunk_size,
+                            workers)[2]
+    def evaluate(self, _x, storage: str = 'full', out=None, chunk_size=None,
+                 workers=None):
+        """Calculate the strain energy W, the first Piola-Kirchoff stress
+        P = dW/dF and the elasticity tensor A = d²W/dF² in a single pass.
+
+        Args:
+            _x (Iterable): Deformation gradient values.
+            storage (str): Storage of the tangent, see `hessian`.
+                Defaults to 'full'.
+            out (tuple): Preallocated (energy, stress, tangent) arrays, items
+                may be None.
+            chunk_size (int): Number of elements evaluated at once, see
+                `jacobian`. Defaults to None.
+            workers (int): Number of threads, see `jacobian`. Defaults to None.
 
+        Returns:
+            Evaluation: Named tuple (energy, stress, tangent).
+        """
+        return Evaluation(*self._stream(_x, True, storage, out, chunk_size,
+                                        workers))
@@ -0,0 +1,129 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import numpy as np
+
+from .._profiling._profiler import active
+from ._energy import Evaluation
+from ._tangent import _check
+
+
+class IncrementalEvaluator():
+    """Stateful evaluation of a strain energy which only re-evaluates the
+    points whose deformation gradient changed since the last call.
+
+    The last deformation gradient, energy, stress and tangent are stored. On
+    each call the points which changed by more than `tol` (or an explicit
+    set of points) are evaluated and scattered into the stored results, so
+    the cost of a Newton iteration is proportional to the active region.
+    The results are fully re-evaluated if the shape of F, the material
+    parameters or the precision change.
+    """
+    def __init__(self, umat, storage: str = 'full', tol: float = 0.0):
+        """umat: strain energy, see `StrainEnergy`
+
+        storage: storage of the tangent, see `StrainEnergy.hessian`.
+
+        tol: points are re-evaluated if a component of F changed by more
+        than `tol` w.r.t. the last evaluated F of the point. Defaults to 0,
+        i.e. any change.
+        """
+        _check(storage)
+        self.umat = umat
+        self.storage = storage
+        self.tol = tol
+        self.stats = {'calls':0, 'points':0, 'evaluated':0}
+        self.reset()
+
+    def reset(self):
+        """Discards the stored state, the next call evaluates all points"""
+        self._f = None
+        self._results = None
+        self._params = None
+        self._dtype = None
+
+    def _changed(self, params):
+        """Whether the material parameters or the precision changed"""
+        if self._params is None or self._dtype != self.umat.dtype:
+            return True
+        return self._params.keys() != params.keys() or any(
+            not np.array_equal(self._params[key], value) for key, value in params.items())
+
+    def evaluate(self, _x, index=None):
+        """Calculate the strain energy, the stress and the tangent.
+
+        Args:
+            _x (np.ndarray): Deformation gradient values.
+            index (np.ndarray): Points to re-evaluate, as a boolean mask or
+                as flat indices of the batch axes of F. Defaults to None
+                (the points whose F changed by more than `tol`).
+
+        Returns:
+            Evaluation: Named tuple (energy, stress, tangent). The arrays are
+            the stored state of the evaluator and must not be modified.
+        """
+        umat = self.umat
+        params = umat._parameters()
+        _x = np.asarray(umat._broadcast(_x, params))
+        _batch = _x.shape[2:]
+        self.stats['calls'] += 1
+        self.stats['points'] += int(np.prod(_batch))
+        if self._f is None or self._f.shape != _x.shape or self._changed(params):
+            self._results = [_result if _result.flags.writeable else _result.copy()
+                             for _result in umat._stream(_x, True, self.storage, None, None)]
+            self._f = np.array(_x)
+            self._params = {key:np.array(value) for key, value in params.items()}
+            self._dtype = umat.dtype
+            _count = int(np.prod(_batch))
+        else:
+            if index is None:
+                _mask = np.any(np.abs(_x - self._f) > self.tol, axis=(0, 1))
+            else:
+                _index = np.asarray(index)
+                if _index.dtype == bool:
+                    _mask = np.broadcast_to(_index, _batch)
+                else:
+                    _mask = np.zeros(_batch, dtype=bool)
+                    _mask.flat[_index] = True
+            _count = int(np.count_nonzero(_mask))
+            if _count:
+                _params = {key:np.broadcast_to(value, _batch)[_mask] if np.ndim(value)
+                           else value for key, value in params.items()}
+                _f = _x[:, :, _mask]
+                _results = umat._block(_f, True, self.storage, _params)
+                for _stored, _result in zip(self._results, _results):
+                    _stored[..., _mask] = _result
+                self._f[:, :, _mask] = _f
+        self.stats['evaluated'] += _count
+        _profiler = active()
+        if _profiler is not None:
+            _profiler.count('incremental_points', _count)
+        return Evaluation(*self._results)
+
+    def jacobian(self, _x, index=None):
+        """First Piola-Kirchhoff stress, see `evaluate`"""
+        return self.evaluate(_x, index).stress
+
+    def hessian(self, _x, index=None):
+        """Tangent in the storage of the evaluator, see `evaluate`"""
+        return self.evaluate(_x, index).tangent
@@ -40,36 +40,42 @@ from ._energy import StrainEnergy
 
 class NeoHooke(StrainEnergy):
     """Neo-Hooke hyperelastic model"""
+    _kinematics = 'invariants'
     def __init__(self, **kwargs):
         self._label = 'Neo-Hooke'
         super().__init__(neo_hooke, **kwargs)
 
 class MooneyRivlin(StrainEnergy):
     """Mooney-Rivlin hyperelastic model"""
+    _kinematics = 'invariants'
     def __init__(self, **kwargs):
         self._label = 'Mooney-Rivlin'
         super().__init__(mooney_rivlin, **kwargs)
 
 class Isihara(StrainEnergy):
     """Isihara hyperelastic model"""
+    _kinematics = 'invariants'
     def __init__(self, **kwargs):
         self._label = 'Isihara'
         super().__init__(isihara, **kwargs)
 
 class Biderman(StrainEnergy):
     """Biderman hyperelastic model"""
+    _kinematics = 'invariants'
     def __init__(self, **kwargs):
         self._label = 'Biderman'
         super().__init__(biderman, **kwargs)
 
 class Yeoh(StrainEnergy):
     """Yeoh hyperelastic model"""
+    _kinematics = 'invariants'
     def __init__(self, **kwargs):
         self._label = 'Yeoh'
         super().__init__(yeoh, **kwargs)
 
 class JamesGreenSimpson(StrainEnergy):
     """James-Green-Simpson hyperelastic model"""
+    _kinematics = 'invariants'
     def __init__(self, **kwargs):
         self._label = 'JamesGreenSimpson'
         super().__init__(james_green_simpson, **kwargs)
@@ -80,6 +86,7 @@ class JamesGreenSimpson(StrainEnergy):
 
 class Ogden(StrainEnergy):
     """Ogden hyperelastic model"""
+    _kinematics = 'stretches'
     def __init__(self, **kwargs):
         self._label = 'Ogden'
         super().__init__(ogden, **kwargs)
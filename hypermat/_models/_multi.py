@@ -0,0 +1,155 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+
+import numpy as np
+
+from .._profiling._profiler import active
+from ._energy import Evaluation
+from ._tangent import _check
+
+
+def _scatter(out, result, index, batch):
+    """Write the results of the flat points `index` into `out`, component by
+    component for contiguous outputs"""
+    if not out.flags.c_contiguous:
+        out[(Ellipsis,) + np.unravel_index(index, batch)] = result
+        return
+    _result = result.reshape(-1, index.size)
+    for _row, _values in zip(out.reshape(-1, int(np.prod(batch))), _result):
+        _row[index] = _values
+
+
+class MultiMaterial():
+    """Evaluation of several materials on one mesh from a material-ID array.
+
+    The materials are grouped by model: instances of the same model class
+    and energy functions (with the same parameter names, method and
+    precision) are merged into per-point parameter arrays, so each group is
+    evaluated in a single vectorized pass. The results of the groups are
+    written in place into the output arrays of the whole mesh.
+    """
+    def __init__(self, materials, ids):
+        """materials: list of strain energies, see `StrainEnergy`
+
+        ids: index into `materials` of every point, an integer array which
+        broadcasts against the batch axes of the deformation gradient, e.g.
+        of shape (nel,) for one material per element.
+        """
+        self.materials = list(materials)
+        if not self.materials:
+            raise ValueError('At least one material is required.')
+        self.ids = np.asarray(ids)
+        if not np.issubdtype(self.ids.dtype, np.integer):
+            raise TypeError('The material ids must be integers.')
+        if self.ids.size and (self.ids.min() < 0 or self.ids.max() >= len(self.materials)):
+            raise ValueError('The material ids must be in [0, %d).'%(len(self.materials)))
+
+    def _groups(self, _batch):
+        """Model, points and merged parameters of each group of materials"""
+        _ids = np.broadcast_to(self.ids, _batch)
+        _members = {}
+        for _index, umat in enumerate(self.materials):
+            _key = (type(umat), umat.iso_func, umat.vol_func, umat.args,
+                    tuple(umat.kwargs), umat.method, umat.dtype)
+            _members.setdefault(_key, []).append(_index)
+        for _indices in _members.values():
+            _lookup = np.full(len(self.materials), -1)
+            _lookup[_indices] = np.arange(len(_indices))
+            _local = _lookup[_ids]
+            _mask = _local >= 0
+            if not _mask.any():
+                continue
+            _local = _local[_mask]
+            _params = [self.materials[_index]._parameters() for _index in _indices]
+            params = {}
+            for _key in _params[0]:
+                _values = [_p[_key] for _p in _params]
+                if all(np.ndim(_value) == 0 for _value in _values):
+                    if all(_value == _values[0] for _value in _values):
+                        params[_key] = _values[0]
+                    else:
+                        params[_key] = np.asarray(_values)[_local]
+                    continue
+                # parameter fields of the materials, gathered with the points
+                _value = np.empty(_local.shape, dtype=np.result_type(*_values))
+                for _m, _field in enumerate(_values):
+                    _sel = _local == _m
+                    _value[_sel] = (np.broadcast_to(_field, _batch)[_mask][_sel]
+                                    if np.ndim(_field) else _field)
+                params[_key] = _value
+            yield self.materials[_indices[0]], np.flatnonzero(_mask), params
+
+    def _evaluate(self, _x, hessian, storage, out, chunk_size):
+        """Evaluate all groups in blocks of `chunk_size` points and write the
+        results into `out`"""
+        _check(storage)
+        _x = np.asarray(_x)
+        _batch = _x.shape[2:]
+        _points = _x.reshape(3, 3, -1)
+        _profiler = active()
+        if _profiler is not None:
+            _profiler.count('evaluations')
+            _profiler.count('points', int(np.prod(_batch)))
+        out = [None]*3 if out is None else list(out)
+        for umat, _index, params in self._groups(_batch):
+            _size = chunk_size or _index.size
+            for _start in range(0, _index.size, _size):
+                _slice = slice(_start, _start + _size)
+                _params = umat._slice(params, _index.shape, _slice)
+                # contiguous gather, fancy indexing would return a strided copy
+                _f = np.take(_points, _index[_slice], axis=2)
+                _results = umat._block(_f, hessian, storage, _params)
+                for _i, _result in enumerate(_results):
+                    if _result is None or (_i == 0 and not hessian):
+                        continue
+                    if out[_i] is None:
+                        out[_i] = np.empty(_result.shape[:-1] + _batch,
+                                           dtype=_result.dtype)
+                    _scatter(out[_i], _result, _index[_slice], _batch)
+        return out
+
+    def jacobian(self, _x, out=None, chunk_size=None):
+        """First Piola-Kirchhoff stress, see `evaluate`"""
+        return self._evaluate(_x, False, 'full', (None, out, None), chunk_size)[1]
+
+    def hessian(self, _x, storage: str = 'full', out=None, chunk_size=None):
+        """Tangent of all points, see `evaluate`"""
+        return self._evaluate(_x, True, storage, (None, None, out), chunk_size)[2]
+
+    def evaluate(self, _x, storage: str = 'full', out=None, chunk_size=None):
+        """Calculate the strain energy, the stress and the tangent of all points.
+
+        Args:
+            _x (np.ndarray): Deformation gradient values.
+            storage (str): Storage of the tangent, see `StrainEnergy.hessian`.
+                Defaults to 'full'.
+            out (tuple): Preallocated (energy, stress, tangent) arrays, items
+                may be None. The results are written in place.
+            chunk_size (int): Number of points of a group evaluated at once.
+                Defaults to None (each group at once).
+
+        Returns:
+            Evaluation: Named tuple (energy, stress, tangent).
+        """
+        return Evaluation(*self._evaluate(_x, True, storage, out, chunk_size))
@@ -0,0 +1,148 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import numpy as np
+
+
+# Storage of the fourth-order tangent
+#   'full'   : dense A = d²W/dF², shape (3, 3, 3, 3, ...)
+#   'major'  : upper triangle of A as a 9x9 matrix (major symmetry), shape (45, ...)
+#   'voigt'  : upper triangle of the material tangent ℂ = 4 d²W/dCdC as a 6x6
+#              Voigt matrix (major and minor symmetries), shape (21, ...)
+#   'mandel' : same as 'voigt' with the √2 scaling of the shear components
+# The packed components are the upper triangles in row-major order. The
+# Voigt/Mandel order of the symmetric index pairs is 11, 22, 33, 12, 23, 13,
+# which differs from the common 11, 22, 33, 23, 13, 12.
+STORAGES = ('full', 'major', 'voigt', 'mandel')
+
+_VOIGT = np.array([(0, 0), (1, 1), (2, 2), (0, 1), (1, 2), (0, 2)])
+_SCALE = {'voigt':np.ones(6), 'mandel':np.array([1.0, 1.0, 1.0] + [np.sqrt(2.0)]*3)}
+# Voigt strains carry the engineering shear 2 E_ij
+_STRAIN = {'voigt':np.array([1.0, 1.0, 1.0, 2.0, 2.0, 2.0]), 'mandel':_SCALE['mandel']}
+_TRIU = {'major':np.triu_indices(9), 'voigt':np.triu_indices(6),
+         'mandel':np.triu_indices(6)}
+
+def _check(storage):
+    """Check the name of the tangent storage"""
+    if storage not in STORAGES:
+        raise ValueError("Unknown storage '%s', use one of %s."%(storage, STORAGES))
+
+def material_tangent(_f, _p, _a):
+    """Pull back A = d²W/dF² to the material tangent ℂ = 4 d²W/dCdC.
+
+    ℂ_MJNL = F⁻¹_Mi F⁻¹_Nk (A_iJkL - δ_ik S_JL) with S = F⁻¹ P.
+    """
+    _finv = np.linalg.inv(np.moveaxis(_f, (0, 1), (-2, -1)))
+    _finv = np.moveaxis(_finv, (-2, -1), (0, 1))
+    _s = np.einsum('Mi...,iJ...->MJ...', _finv, _p)
+    _a = _a.copy()
+    for _i in range(3):
+        _a[_i, :, _i, :] -= _s
+    _a = np.einsum('Mi...,iJkL...->MJkL...', _finv, _a)
+    return np.einsum('Nk...,MJkL...->MJNL...', _finv, _a)
+
+def pack_tangent(_a, storage: str = 'major'):
+    """Pack a fourth-order tangent into symmetric storage.
+
+    Args:
+        _a (np.ndarray): A = d²W/dF² for 'major', ℂ = 4 d²W/dCdC for 'voigt'
+            and 'mandel', with shape (3, 3, 3, 3, ...).
+        storage (str): Packed storage. Defaults to 'major'.
+
+    Returns:
+        np.ndarray: Upper triangle components with shape (45, ...) or (21, ...).
+    """
+    _check(storage)
+    if storage == 'full':
+        return _a
+    _rows, _cols = _TRIU[storage]
+    if storage == 'major':
+        return _a.reshape((9, 9) + _a.shape[4:])[_rows, _cols]
+    _w = _SCALE[storage]
+    _i, _j = _VOIGT[_rows].T
+    _k, _l = _VOIGT[_cols].T
+    _w = (_w[_rows] * _w[_cols]).reshape((-1,) + (1,)*(_a.ndim-4)).astype(_a.dtype)
+    return _w * _a[_i, _j, _k, _l]
+
+def unpack_tangent(_packed, storage: str = 'major'):
+    """Expand a packed tangent to the dense fourth-order tensor.
+
+    Args:
+        _packed (np.ndarray): Packed tangent, see `pack_tangent`.
+        storage (str): Packed storage. Defaults to 'major'.
+
+    Returns:
+        np.ndarray: Dense tangent with shape (3, 3, 3, 3, ...).
+    """
+    _check(storage)
+    if storage == 'full':
+        return _packed
+    _rows, _cols = _TRIU[storage]
+    _n = 9 if storage == 'major' else 6
+    _m = np.empty((_n, _n) + _packed.shape[1:], dtype=_packed.dtype)
+    _m[_rows, _cols] = _packed
+    _m[_cols, _rows] = _packed
+    if storage == 'major':
+        return _m.reshape((3, 3, 3, 3) + _packed.shape[1:])
+    _w = _SCALE[storage]
+    _m /= np.outer(_w, _w).reshape((_n, _n) + (1,)*(_packed.ndim-1))
+    _index = np.empty((3, 3), dtype=int)
+    _index[_VOIGT[:, 0], _VOIGT[:, 1]] = _index[_VOIGT[:, 1], _VOIGT[:, 0]] = range(6)
+    return _m[_index[:, :, None, None], _index[None, None, :, :]]
+
+def apply_tangent(_packed, _x, storage: str = 'major'):
+    """Contract a packed tangent with a second-order tensor without expanding it.
+
+    For 'major' (and 'full') this is δP = A : δF. For 'voigt' and 'mandel' the
+    material tangent acts on a symmetric tensor, δS = ℂ : δE.
+
+    Args:
+        _packed (np.ndarray): Packed tangent, see `pack_tangent`.
+        _x (np.ndarray): Second-order tensor with shape (3, 3, ...).
+        storage (str): Packed storage. Defaults to 'major'.
+
+    Returns:
+        np.ndarray: Second-order tensor with shape (3, 3, ...).
+    """
+    _check(storage)
+    if storage == 'full':
+        return np.einsum('ijkl...,kl...->ij...', _packed, _x)
+    _rows, _cols = _TRIU[storage]
+    if storage == 'major':
+        _v = _x.reshape((9,) + _x.shape[2:])
+    else:
+        _v = _x[_VOIGT[:, 0], _VOIGT[:, 1]]
+        _v = _v * _STRAIN[storage].reshape((6,) + (1,)*(_v.ndim-1)).astype(_x.dtype)
+    _shape = np.broadcast_shapes(_packed.shape[1:], _v.shape[1:])
+    _y = np.zeros((len(_v),) + _shape, dtype=np.result_type(_packed, _v))
+    for _k, (_r, _c) in enumerate(zip(_rows, _cols)):
+        _y[_r] += _packed[_k] * _v[_c]
+        if _r != _c:
+            _y[_c] += _packed[_k] * _v[_r]
+    if storage == 'major':
+        return _y.reshape((3, 3) + _shape)
+    _y /= _SCALE[storage].reshape((6,) + (1,)*(_y.ndim-1)).astype(_y.dtype)
+    _out = np.empty((3, 3) + _shape, dtype=_y.dtype)
+    _out[_VOIGT[:, 0], _VOIGT[:, 1]] = _y
+    _out[_VOIGT[:, 1], _VOIGT[:, 0]] = _y
+    return _out
@@ -0,0 +1,4 @@
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""Profiling Module"""
+from ._profiler import Profiler, profile, active
@@ -0,0 +1,131 @@
+
+####################### - بــسم الله الرحمــان الرحيــم - #####################
+
+"""
+    HyperMAT
+    Created August 2023
+    Copyright (C) Mohamed ZAARAOUI
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 2
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+
+# profiler of the current profile context, None when profiling is disabled
+_ACTIVE = None
+_NULL = nullcontext()
+
+
+class Profiler():
+    """Counters and per-phase wall times of evaluations and calibrations.
+
+    The times of a phase are summed over its calls, also over the threads
+    of a parallel evaluation. Profilers of nested `profile` contexts forward
+    their records to the enclosing profiler.
+    """
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.parent = None
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1):
+        """Increments a counter"""
+        with self._lock:
+            self.counters[name] += value
+        if self.parent is not None:
+            self.parent.count(name, value)
+
+    def add(self, name: str, elapsed: float):
+        """Adds the wall time of one call of a phase"""
+        with self._lock:
+            self.timers[name] += elapsed
+            self.calls[name] += 1
+        if self.parent is not None:
+            self.parent.add(name, elapsed)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Measures the wall time of a phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def as_dict(self):
+        """Counters and timers as plain dicts"""
+        return {'counters':dict(self.counters),
+                'timers':{name:{'time':self.timers[name], 'calls':self.calls[name]}
+                          for name in self.timers}}
+
+    def reset(self):
+        """Clears all records"""
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+            self.calls.clear()
+
+    def report(self):
+        """Summary table of the phases and counters"""
+        lines = ['%-24s %10s %12s'%('phase', 'calls', 'time [s]')]
+        for name in sorted(self.timers, key=self.timers.get, reverse=True):
+            lines.append('%-24s %10d %12.6f'%(name, self.calls[name], self.timers[name]))
+        lines.append('%-24s %10s'%('counter', 'value'))
+        for name in sorted(self.counters):
+            lines.append('%-24s %10d'%(name, self.counters[name]))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.report()
+
+
+def active():
+    """Profiler of the current profile context, None if disabled"""
+    return _ACTIVE
+
+def phase(name: str):
+    """Measures a phase with the active profiler, no-op if disabled"""
+    if _ACTIVE is None:
+        return _NULL
+    return _ACTIVE.phase(name)
+
+@contextmanager
+def profile(profiler: Profiler | None = None):
+    """Enables profiling inside the context.
+
+    Args:
+        profiler (Profiler): Profiler recording the evaluations and
+            calibrations. Defaults to a new profiler.
+
+    Yields:
+        Profiler: The recording profiler.
+    """
+    global _ACTIVE
+    profiler = Profiler() if profiler is None else profiler
+    previous = _ACTIVE
+    profiler.parent = previous if previous is not profiler else None
+    _ACTIVE = profiler
+    try:
+        yield profiler
+    finally:
+        _ACTIVE = previous
+        profiler.parent = None
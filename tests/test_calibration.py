@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+import hypermat as hm
+
+
+def _uniaxial(**kwargs):
+    """Uniaxial test of a NeoHooke material on its own synthetic data"""
+    strain = np.linspace(0.05, 0.5, 10)
+    reference = hm.Uniaxial(hm.NeoHooke(C10=0.5, K=100.0),
+                            {'strain':strain, 'stress':np.zeros(strain.size)})
+    reference._set_lateral(reference._grad,
+                           reference._solve(reference._guess(reference._stretch())))
+    data = {'strain':strain, 'stress':reference.stress()[0,0,:,0].copy()}
+    return hm.Uniaxial(hm.NeoHooke(C10=0.8, K=100.0), data, **kwargs)
+
+def test_profiled_fit_without_jacobian():
+    test = _uniaxial()
+    result = test.fit_data([0.0, 0.0], [10.0, 1e4], [True, False], jacobian=False,
+                           profile=True)
+    assert np.isclose(result.params['C10'].value, 0.5, rtol=1e-6)
+    assert 'parameter_jacobian' not in result.profile.timers
+    assert result.profile.counters['objective_calls'] > 0
+    with hm.profile():
+        result = _uniaxial().fit_data([0.0, 0.0], [10.0, 1e4], [True, False],
+                                      jacobian=False)
+    assert np.isclose(result.params['C10'].value, 0.5, rtol=1e-6)
+
+def test_newton_batched_points():
+    from hypermat._calibration._solver import newton
+    a = np.array([1.0, 8.0, 27.0, 0.5, 1e3])
+    calls = []
+    def func(x, index):
+        calls.append(index.size)
+        return x**3 - a[index], 3.0 * x**2
+    x, info = newton(func, np.ones(a.size))
+    assert info['converged']
+    assert np.allclose(x, np.cbrt(a), rtol=1e-12)
+    # converged points are dropped from the following calls
+    assert calls[0] == a.size and calls[-1] < a.size
+    assert info['evaluations'] == sum(calls)
+
+def test_newton_restarts_from_neighbours():
+    from hypermat._calibration._solver import newton
+    a = np.linspace(1.0, 2.0, 5)
+    # zero derivative at the start of the middle point
+    x, info = newton(lambda x, index: (x**3 - a[index], 3.0 * x**2),
+                     np.array([1.0, 1.0, 0.0, 1.0, 1.0]))
+    assert info['converged']
+    assert np.allclose(x, np.cbrt(a), rtol=1e-12)
+
+@pytest.mark.parametrize('test', ['Uniaxial', 'EquiBiaxial', 'PureShear'])
+def test_lateral_stretch_is_traction_free(test):
+    strain = np.array([0.0, 1e-8, 0.1, 0.5, 1.0])
+    fit = getattr(hm, test)(hm.MooneyRivlin(C10=0.4, C01=0.1, K=50.0),
+                            {'strain':strain, 'stress':np.zeros(strain.size)})
+    lam2 = fit._solve(fit._guess(fit._stretch()))
+    assert fit.info['converged']
+    fit._set_lateral(fit._grad, lam2)
+    i, j = fit._free
+    assert np.allclose(fit._umat.jacobian(fit._grad)[i,j], 0.0, atol=1e-10)
+    assert np.isclose(lam2[0], 1.0)
+
+@pytest.mark.parametrize('incompressible', [False, True])
+@pytest.mark.parametrize('test', ['Uniaxial', 'EquiBiaxial', 'PureShear'])
+def test_jacobian_implicit_differentiation(test, incompressible):
+    import lmfit as lm
+
+    strain = np.array([1e-6, 0.1, 0.5, 1.0])
+    # the data is off the model curve, so the residuals are not zero
+    fit = getattr(hm, test)(hm.MooneyRivlin(C10=0.4, C01=0.1, K=50.0),
+                            {'strain':strain, 'stress':np.full(strain.size, 10.0)},
+                            incompressible=incompressible)
+    params = lm.Parameters()
+    for name, value in (('C10', 0.4), ('C01', 0.1), ('K', 50.0)):
+        params.add(name, value=value, vary=name!='K' or not incompressible)
+    jac = fit._jacobian(params)
+    names = [name for name in params if params[name].vary]
+    for n, name in enumerate(names):
+        h = 1e-6 * params[name].value
+        params[name].value += h
+        r = fit._objective(params)
+        params[name].value -= 2.0 * h
+        r = (r - fit._objective(params)) / (2.0 * h)
+        params[name].value += h
+        # the differences carry the tolerance of the lateral stretch solve
+        assert np.allclose(jac[:,n], r, rtol=1e-6, atol=1e-6 * np.abs(r).max())
+
+def _synthetic(test, umat, strain, **kwargs):
+    """Test of `umat` on the stress data of the same model"""
+    reference = getattr(hm, test)(umat, {'strain':strain, 'stress':np.zeros(strain.size)},
+                                  incompressible=kwargs.get('incompressible', False))
+    reference._set_lateral(reference._grad,
+                           reference._equilibrium(_parameters(umat)))
+    stress = reference._first_piola()[0,0,:,0].copy()
+    return {'strain':strain, 'stress':stress}
+
+def _parameters(umat, vary=True):
+    import lmfit as lm
+
+    params = lm.Parameters()
+    for name, value in dict(umat.kwargs, K=umat._bulk).items():
+        params.add(name, value=value, vary=vary and name!='K')
+    return params
+
+def _joint(umat, factor=1.0):
+    """Compressible, incompressible and decimated tests of one model, with
+    the data of `umat` scaled by `factor`"""
+    tests = []
+    for test, strain, kwargs in (
+            ('Uniaxial', np.linspace(0.01, 1.0, 8), {}),
+            ('EquiBiaxial', np.linspace(0.01, 0.5, 6), {'incompressible':True}),
+            ('PureShear', np.linspace(0.01, 1.0, 200), {'decimate':1e-4})):
+        data = _synthetic(test, umat, strain, **kwargs)
+        data['stress'] *= factor
+        tests.append(getattr(hm, test)(hm.MooneyRivlin(C10=0.6, C01=0.2, K=100.0),
+                                       data, **kwargs))
+    return tests
+
+def test_joint_jacobian_implicit_differentiation():
+    tests = _joint(hm.MooneyRivlin(C10=0.4, C01=0.1, K=100.0), factor=1.5)
+    assert tests[2].weights is not None and tests[2].data['strain'].size < 200
+    joint = hm.Joint(tests, weights=[1.0, 2.0, 0.5])
+    params = _parameters(tests[0]._umat)
+    params['K'].vary = True
+    jac = joint._jacobian(params)
+    for n, name in enumerate(params):
+        h = 1e-6 * params[name].value
+        params[name].value += h
+        r = joint._objective(params)
+        params[name].value -= 2.0 * h
+        r = (r - joint._objective(params)) / (2.0 * h)
+        params[name].value += h
+        assert np.allclose(jac[:,n], r, rtol=1e-6, atol=1e-6 * np.abs(r).max())
+
+def test_joint_fit_recovers_parameters():
+    joint = hm.Joint(_joint(hm.MooneyRivlin(C10=0.4, C01=0.1, K=100.0)))
+    result = joint.fit_data([0.0, -1.0, 0.0], [10.0, 1.0, 1e4], [True, True, False])
+    assert np.isclose(result.params['C10'].value, 0.4, rtol=1e-6)
+    assert np.isclose(result.params['C01'].value, 0.1, rtol=1e-5)
+    # the residuals of every test vanish, including the incompressible one
+    assert np.allclose(joint._objective(result.params), 0.0, atol=1e-8)
+    # the fitted parameters are set on the materials of all tests
+    assert all(np.isclose(test._umat.kwargs['C10'], 0.4, rtol=1e-6)
+               for test in joint.tests)
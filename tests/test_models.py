@@ -0,0 +1,301 @@
+import numpy as np
+import pytest
+import tensortrax.math as tm
+
+import hypermat as hm
+
+
+def _deformation(seed=0):
+    rng = np.random.default_rng(seed)
+    return np.eye(3)[:,:,None,None] + rng.uniform(-0.1, 0.1, (3, 3, 4, 2))
+
+def _stretch_energy(_F, mu):
+    _λ1, _λ2, _λ3 = _F.stretches
+    return mu / 2.0 * (_λ1**2 + _λ2**2 + _λ3**2 - 3.0)
+
+def _tensor_energy(_F, C10):
+    _C = _F.invariants[0]
+    return C10 * (tm.trace(_C) - 3.0)
+
+@pytest.mark.parametrize('func, params', [(_stretch_energy, {'mu':1.0}),
+                                          (_tensor_energy, {'C10':0.5})])
+def test_custom_energy_uses_tensor_method(func, params):
+    F = _deformation()
+    umat = hm.StrainEnergy(func, **params)
+    P = umat.jacobian(F)
+    umat.method = 'tensor'
+    assert np.allclose(P, umat.jacobian(F))
+    umat.method = 'invariants'
+    with pytest.raises(ValueError, match="method='tensor'"):
+        umat.jacobian(F)
+
+@pytest.mark.parametrize('method', ['auto', 'tensor'])
+@pytest.mark.parametrize('umat', [hm.NeoHooke(C10=0.5, K=10.0),
+                                  hm.Ogden(mu1=1.0, a1=2.0, K=10.0)])
+def test_energy_is_writable(umat, method):
+    umat.method = method
+    W = umat.evaluate(_deformation()).energy
+    assert W.flags.writeable and W.flags.c_contiguous
+    W[...] = 0.0
+
+def _states():
+    """Deformation gradients at identity, with near-equal stretches, in a
+    rotated state with two equal stretches and at random"""
+    θ = 0.4
+    R = np.array([[np.cos(θ), -np.sin(θ), 0.0], [np.sin(θ), np.cos(θ), 0.0],
+                  [0.0, 0.0, 1.0]])
+    states = {'identity':np.eye(3),
+              'near-equal':np.diag([1.2, 1.2 + 1e-7, 0.7]),
+              'rotated':R @ np.diag([1.1, 1.1, 0.9]) @ R.T,
+              'random':np.eye(3) + np.random.default_rng(1).uniform(-0.2, 0.2, (3, 3))}
+    return {name:np.repeat(F[:,:,None,None], 2, axis=2) for name, F in states.items()}
+
+def _compare(umat, F, rtol=1e-9):
+    """Energy, stress and tangent of the default method against the tensor
+    method"""
+    W, P, A = umat.evaluate(F)
+    umat.method = 'tensor'
+    W0, P0, A0 = umat.evaluate(F)
+    umat.method = 'auto'
+    for value, reference in ((W, W0), (P, P0), (A, A0)):
+        assert np.allclose(value, reference, rtol=rtol,
+                           atol=rtol * max(np.abs(reference).max(), 1.0))
+
+def _finite_differences(umat, F, A, h=1e-6):
+    """Tangent against central differences of the stress"""
+    A_fd = np.zeros_like(A)
+    for i in range(3):
+        for j in range(3):
+            dF = np.zeros_like(F)
+            dF[i,j] = h
+            A_fd[:,:,i,j] = (umat.jacobian(F + dF) - umat.jacobian(F - dF)) / (2.0 * h)
+    assert np.allclose(A, A_fd, rtol=1e-6, atol=1e-6 * np.abs(A).max())
+
+@pytest.mark.parametrize('state', list(_states()))
+@pytest.mark.parametrize('umat', [
+    hm.NeoHooke(C10=0.5, K=10.0),
+    hm.MooneyRivlin(C10=0.4, C01=0.1, K=10.0),
+    hm.Isihara(C10=0.4, C20=0.01, C01=0.1, K=10.0),
+    hm.Biderman(C10=0.4, C20=-0.01, C30=0.005, C01=0.1, K=10.0),
+    hm.Yeoh(C10=0.5, C20=-0.01, C30=0.005, K=10.0),
+    hm.JamesGreenSimpson(C10=0.4, C20=-0.01, C30=0.005, C01=0.1, C11=0.01, K=10.0)])
+def test_invariant_chain_rule(umat, state):
+    F = _states()[state]
+    _compare(umat, F)
+    _finite_differences(umat, F, umat.hessian(F))
+
+@pytest.mark.parametrize('state', list(_states()))
+def test_ogden_spectral_derivatives(state):
+    F = _states()[state]
+    umat = hm.Ogden(mu1=1.0, a1=2.5, mu2=-0.1, a2=-2.0, K=10.0)
+    # the hyper-dual eigvalsh of the tensor method is accurate to about 1e-9
+    _compare(umat, F, rtol=1e-7)
+    _finite_differences(umat, F, umat.hessian(F))
+    c = np.linalg.eigvalsh(F[:,:,0,0].T @ F[:,:,0,0])
+    J = np.sqrt(np.prod(c))
+    λ = J**(-1.0/3.0) * np.sqrt(c)
+    W = sum(2.0 * mu / a**2 * (np.sum(λ**a) - 3.0) for mu, a in ((1.0, 2.5), (-0.1, -2.0)))
+    assert np.allclose(umat.evaluate(F).energy, W + 5.0 * (J - 1.0)**2, rtol=1e-12,
+                       atol=1e-15)
+
+def test_closed_form_eigenpairs():
+    from hypermat._ad._stretches import eigh
+    F = np.stack([F[:,:,0,0] for F in _states().values()], axis=-1)
+    C = np.einsum('ki...,kj...->ij...', F, F)
+    values, vectors = eigh(C)
+    # orthonormal eigenvectors which diagonalize C
+    assert np.allclose(np.einsum('ai...,bi...->ab...', vectors, vectors),
+                       np.eye(3)[:,:,None], atol=1e-12)
+    assert np.allclose(np.einsum('ai...,ij...,aj...->a...', vectors, C, vectors), values)
+    assert np.allclose(np.sort(values, axis=0),
+                       np.linalg.eigvalsh(np.moveaxis(C, -1, 0)).T, atol=1e-12)
+
+def _linear_energy(_F, C10):
+    _, _J1, _, _ = _F.invariants
+    return C10 * (_J1 - 3.0)
+
+def _quadratic_energy(_F, C10):
+    _, _J1, _, _ = _F.invariants
+    return C10 * (_J1 - 3.0)**2
+
+def _materials(F, materials, ids):
+    """Results of each material on its own points"""
+    ids = np.broadcast_to(ids, F.shape[2:])
+    results = [np.empty((3, 3) + F.shape[2:]), np.empty((3, 3, 3, 3) + F.shape[2:])]
+    for index, umat in enumerate(materials):
+        mask = ids == index
+        _, P, A = umat.evaluate(F[:,:,mask])
+        results[0][:,:,mask], results[1][...,mask] = P, A
+    return results
+
+def test_multi_material_groups():
+    F = _deformation()
+    materials = [hm.StrainEnergy(_linear_energy, C10=0.5, K=10.0),
+                 hm.StrainEnergy(_quadratic_energy, C10=0.5, K=10.0),
+                 hm.NeoHooke(C10=0.5, K=10.0), hm.NeoHooke(C10=0.8, K=5.0),
+                 hm.Ogden(mu1=1.0, a1=2.5, K=10.0)]
+    ids = np.array([0, 1, 2, 3, 4, 2, 3, 1]).reshape(4, 2)
+    P, A = hm.MultiMaterial(materials, ids).evaluate(F)[1:]
+    P0, A0 = _materials(F, materials, ids)
+    assert np.allclose(P, P0) and np.allclose(A, A0)
+
+def test_multi_material_parameter_fields():
+    F = _deformation()
+    C10 = np.array([0.3, 0.6])
+    materials = [hm.NeoHooke(C10=C10, K=10.0), hm.NeoHooke(C10=0.8, K=10.0),
+                 hm.MooneyRivlin(C10=0.4, C01=0.1, K=10.0)]
+    ids = np.array([[0, 1], [0, 2], [1, 0], [2, 0]])
+    P = hm.MultiMaterial(materials, ids).jacobian(F)
+    # the parameter field of material 0 is one value per element
+    for (i, j), index in np.ndenumerate(ids):
+        umat = materials[index]
+        if index == 0:
+            umat = hm.NeoHooke(C10=C10[j], K=10.0)
+        assert np.allclose(P[:,:,i,j], umat.jacobian(F[:,:,i,j]))
+
+def test_multi_material_out():
+    F = _deformation()
+    mesh = hm.MultiMaterial([hm.NeoHooke(C10=0.5, K=10.0),
+                             hm.Yeoh(C10=0.5, C20=-0.01, C30=0.005, K=10.0)], [0, 1])
+    W, P, A = mesh.evaluate(F, storage='mandel')
+    out = (np.zeros_like(W), np.zeros_like(P), np.zeros_like(A))
+    result = mesh.evaluate(F, storage='mandel', out=out, chunk_size=3)
+    assert all(value is buffer for value, buffer in zip(result, out))
+    assert np.allclose(out[0], W) and np.allclose(out[1], P) and np.allclose(out[2], A)
+    # non-contiguous buffers are written in place too
+    buffer = np.zeros((3, 3, 2, 4)).transpose(0, 1, 3, 2)
+    assert mesh.jacobian(F, out=buffer) is buffer
+    assert np.allclose(buffer, P)
+
+@pytest.mark.parametrize('F', [_deformation(), _deformation()[:,:,0,0]])
+def test_chunks_and_buffers(F):
+    umat = hm.MooneyRivlin(C10=0.4, C01=0.1, K=10.0)
+    W, P, A = umat.evaluate(F)
+    out = (np.zeros_like(W), np.zeros_like(P), np.zeros_like(A))
+    for kwargs in ({'chunk_size':1}, {'chunk_size':2, 'workers':2}, {'out':out}):
+        result = umat.evaluate(F, **kwargs)
+        assert np.allclose(result.energy, W)
+        assert np.allclose(result.stress, P) and np.allclose(result.tangent, A)
+    assert all(value is buffer for value, buffer in zip(umat.evaluate(F, out=out), out))
+    buffer = np.zeros_like(P)
+    assert umat.jacobian(F, out=buffer, chunk_size=1) is buffer
+    assert np.allclose(buffer, P)
+
+@pytest.mark.parametrize('method, umat, bound', [
+    ('invariants', hm.MooneyRivlin(C10=0.4, C01=0.1, K=100.0), 5e-6),
+    ('tensor', hm.MooneyRivlin(C10=0.4, C01=0.1, K=100.0), 5e-6),
+    ('stretches', hm.Ogden(mu1=1.0, a1=2.5, mu2=-0.1, a2=-2.0, K=100.0), 5e-6),
+    ('tensor', hm.Ogden(mu1=1.0, a1=2.5, mu2=-0.1, a2=-2.0, K=100.0), 2e-5)])
+def test_single_precision(method, umat, bound):
+    rng = np.random.default_rng(0)
+    F = np.eye(3)[:,:,None,None] + rng.uniform(-0.2, 0.2, (3, 3, 8, 100))
+    umat.method = method
+    reference = umat.evaluate(F)
+    umat.dtype = np.float32
+    try:
+        result = umat.evaluate(F)
+    finally:
+        umat.dtype = None
+    for value, expected in zip(result, reference):
+        assert value.dtype == np.float32
+        assert np.abs(value - expected).max() <= bound * np.abs(expected).max()
+
+def _tangents():
+    F = _deformation()
+    umat = hm.MooneyRivlin(C10=0.4, C01=0.1, K=10.0)
+    _, P, A = umat.evaluate(F)
+    return umat, F, P, A
+
+def test_major_tangent_round_trip():
+    umat, F, P, A = _tangents()
+    packed = umat.hessian(F, storage='major')
+    assert packed.shape == (45,) + F.shape[2:]
+    assert np.allclose(packed, hm.pack_tangent(A, 'major'))
+    assert np.allclose(hm.unpack_tangent(packed, 'major'), A)
+
+@pytest.mark.parametrize('storage', ['voigt', 'mandel'])
+def test_material_tangent_round_trip(storage):
+    umat, F, P, A = _tangents()
+    C = hm.material_tangent(F, P, A)
+    # minor and major symmetries of ℂ
+    assert np.allclose(C, np.swapaxes(C, 0, 1)) and np.allclose(C, np.swapaxes(C, 2, 3))
+    assert np.allclose(C, np.moveaxis(C, (0, 1), (2, 3)))
+    packed = umat.hessian(F, storage=storage)
+    assert packed.shape == (21,) + F.shape[2:]
+    assert np.allclose(packed, hm.pack_tangent(C, storage))
+    assert np.allclose(hm.unpack_tangent(packed, storage), C)
+    # component order 11, 22, 33, 12, 23, 13 of the first row
+    w = 1.0 if storage == 'voigt' else np.sqrt(2.0)
+    assert np.allclose(packed[:6], [C[0,0,0,0], C[0,0,1,1], C[0,0,2,2], w * C[0,0,0,1],
+                                    w * C[0,0,1,2], w * C[0,0,0,2]])
+
+@pytest.mark.parametrize('storage', ['full', 'major', 'voigt', 'mandel'])
+def test_apply_tangent(storage):
+    umat, F, P, A = _tangents()
+    dF = np.random.default_rng(2).uniform(-1.0, 1.0, F.shape)
+    if storage in ('full', 'major'):
+        expected = np.einsum('ijkl...,kl...->ij...', A, dF)
+    else:
+        dF = (dF + np.swapaxes(dF, 0, 1)) / 2.0
+        expected = np.einsum('ijkl...,kl...->ij...', hm.material_tangent(F, P, A), dF)
+    packed = umat.hessian(F, storage=storage)
+    assert np.allclose(hm.apply_tangent(packed, dF, storage), expected)
+
+def _assert_evaluation(result, umat, F, storage='full'):
+    for value, expected in zip(result, umat.evaluate(F, storage=storage)):
+        assert np.allclose(value, expected)
+
+def test_incremental_tolerance():
+    umat = hm.MooneyRivlin(C10=0.4, C01=0.1, K=10.0)
+    evaluator = hm.IncrementalEvaluator(umat, storage='major', tol=1e-6)
+    F = _deformation()
+    _assert_evaluation(evaluator.evaluate(F), umat, F, 'major')
+    assert evaluator.stats['evaluated'] == 8
+    G = F.copy()
+    G[0,0,1,0] += 1e-3
+    G[1,2,3,1] += 1e-8
+    result = evaluator.evaluate(G)
+    # only the point beyond the tolerance is re-evaluated
+    assert evaluator.stats['evaluated'] == 9
+    _assert_evaluation(result, umat, np.where(np.abs(G - F) > 1e-6, G, F), 'major')
+
+@pytest.mark.parametrize('index', [np.array([2, 7]),
+                                   np.array([[False, False], [True, False],
+                                             [False, False], [False, True]])])
+def test_incremental_index(index):
+    umat = hm.NeoHooke(C10=0.5, K=10.0)
+    evaluator = hm.IncrementalEvaluator(umat)
+    F = _deformation()
+    evaluator.evaluate(F)
+    G = F + 0.01
+    result = evaluator.evaluate(G, index=index)
+    assert evaluator.stats['evaluated'] == 10
+    mask = np.zeros(F.shape[2:], dtype=bool)
+    mask.flat[[2, 7]] = True
+    _assert_evaluation(result, umat, np.where(mask, G, F))
+
+def test_incremental_full_reevaluation():
+    umat = hm.NeoHooke(C10=0.5, K=10.0)
+    evaluator = hm.IncrementalEvaluator(umat)
+    F = _deformation()
+    evaluator.evaluate(F)
+    # parameter change
+    umat.kwargs['C10'] = 0.7
+    _assert_evaluation(evaluator.evaluate(F), umat, F)
+    assert evaluator.stats['evaluated'] == 16
+    # shape change
+    G = F[:,:,:3]
+    _assert_evaluation(evaluator.evaluate(G), umat, G)
+    assert evaluator.stats['evaluated'] == 22
+    # precision change
+    umat.dtype = np.float32
+    try:
+        result = evaluator.evaluate(G)
+        assert result.stress.dtype == np.float32
+        _assert_evaluation(result, umat, G)
+        assert evaluator.stats['evaluated'] == 28
+        # unchanged state
+        evaluator.evaluate(G)
+        assert evaluator.stats['evaluated'] == 28
+    finally:
+        umat.dtype = None